@@ -1,9 +1,10 @@
 # agent.py
 
 import asyncio
-import yaml
+from core.config import shared_config, thaw
 from core.loop import AgentLoop
 from core.session import MultiMCP
+from core.tracing import tracer
 
 def log(stage: str, msg: str):
     """Simple timestamped console logger."""
@@ -16,10 +17,8 @@ async def main():
     print("🧠 Cortex-R Agent Ready")
     user_input = input("🧑 What do you want to solve today? → ")
 
-    # Load MCP server configs from profiles.yaml
-    with open("config/profiles.yaml", "r") as f:
-        profile = yaml.safe_load(f)
-        mcp_servers = profile.get("mcp_servers", [])
+    # MCP server configs from the shared profiles.yaml snapshot
+    mcp_servers = thaw(shared_config().current.profile.get("mcp_servers", ()))
 
     multi_mcp = MultiMCP(server_configs=mcp_servers)
     print("Agent before initialize")
@@ -38,6 +37,10 @@ async def main():
         log("fatal", f"Agent failed: {e}")
         raise
 
+    finally:
+        await multi_mcp.shutdown()
+        tracer.close()
+
 
 if __name__ == "__main__":
     asyncio.run(main())
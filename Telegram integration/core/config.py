@@ -0,0 +1,177 @@
+# core/config.py → Shared configuration snapshot
+# Role: Parses config/profiles.yaml and config/models.json once into a validated,
+# read-only snapshot shared by agent.py, the Telegram bot, AgentProfile and ModelManager.
+
+# A reload builds a brand-new snapshot and swaps the reference in one assignment,
+# so a request that grabbed `store.current` keeps a consistent view for its whole
+# run. A watcher task polls the files' mtimes and reloads on change; an invalid
+# edit is reported and the previous snapshot stays in place.
+
+import json
+import time
+import asyncio
+import functools
+import yaml
+from pathlib import Path
+from types import MappingProxyType
+from typing import Any, Callable, List, Mapping, Optional
+from core.result_cache import files_version
+
+ROOT = Path(__file__).parent.parent
+DEFAULT_PROFILE_PATH = ROOT / "config" / "profiles.yaml"
+
+
+class ConfigError(ValueError):
+    """profiles.yaml or models.json is missing a required setting."""
+
+
+def _freeze(value: Any) -> Any:
+    """Read-only deep view: dicts become MappingProxyType, lists become tuples."""
+    if isinstance(value, dict):
+        return MappingProxyType({k: _freeze(v) for k, v in value.items()})
+    if isinstance(value, list):
+        return tuple(_freeze(v) for v in value)
+    return value
+
+
+def thaw(value: Any) -> Any:
+    """Plain mutable copy of a frozen section (for code that needs real dicts/lists)."""
+    if isinstance(value, Mapping):
+        return {k: thaw(v) for k, v in value.items()}
+    if isinstance(value, tuple):
+        return [thaw(v) for v in value]
+    return value
+
+
+class ConfigSnapshot:
+    __slots__ = ("profile", "models", "version", "loaded_at")
+
+    def __init__(self, profile: dict, models: dict, version: tuple):
+        object.__setattr__(self, "profile", _freeze(profile))
+        object.__setattr__(self, "models", _freeze(models))
+        object.__setattr__(self, "version", version)
+        object.__setattr__(self, "loaded_at", time.time())
+
+    def __setattr__(self, name, value):
+        raise AttributeError("ConfigSnapshot is immutable")
+
+    @classmethod
+    def load(cls, profile_path: Path, models_path: Path) -> "ConfigSnapshot":
+        version = files_version([str(profile_path), str(models_path)])
+        profile = yaml.safe_load(Path(profile_path).read_text())
+        models = json.loads(Path(models_path).read_text())
+        snapshot = cls(profile or {}, models or {}, version)
+        snapshot.validate()
+        return snapshot
+
+    def validate(self):
+        profile, models = self.profile, self.models
+        for section, keys in {
+            "agent": ["name", "id", "description"],
+            "strategy": ["type", "max_steps"],
+            "memory": ["top_k", "embedding_model", "embedding_url"],
+            "llm": ["text_generation"],
+            "persona": [],
+        }.items():
+            if not isinstance(profile.get(section), Mapping):
+                raise ConfigError(f"profiles.yaml: missing section '{section}'")
+            missing = [key for key in keys if key not in profile[section]]
+            if missing:
+                raise ConfigError(f"profiles.yaml: '{section}' is missing {', '.join(missing)}")
+
+        max_steps = profile["strategy"]["max_steps"]
+        if not isinstance(max_steps, int) or max_steps < 1:
+            raise ConfigError(f"profiles.yaml: strategy.max_steps must be a positive integer, got {max_steps!r}")
+
+        planning_mode = profile["strategy"].get("planning_mode", "two_call")
+        if planning_mode not in ("two_call", "fused"):
+            raise ConfigError(f"profiles.yaml: strategy.planning_mode must be two_call or fused, got {planning_mode!r}")
+        # The fused call plans with all tools in one shot; retry_once/explore_all and hint filtering never run
+        if planning_mode == "fused" and profile["strategy"]["type"] != "conservative":
+            raise ConfigError(
+                f"profiles.yaml: planning_mode fused only supports strategy type conservative, "
+                f"got {profile['strategy']['type']!r}"
+            )
+
+        for key, value in profile.get("prompt_budget", {}).items():
+            if key not in ("tool_result", "memory", "memory_item", "tools"):
+                raise ConfigError(f"profiles.yaml: unknown prompt_budget setting '{key}'")
+            if not isinstance(value, int) or value < 1:
+                raise ConfigError(f"profiles.yaml: prompt_budget.{key} must be a positive integer, got {value!r}")
+
+        for server in profile.get("mcp_servers", ()):
+            if "script" not in server:
+                raise ConfigError(f"profiles.yaml: mcp server {server.get('id', '?')} has no script")
+
+        text_model = profile["llm"]["text_generation"]
+        model_info = models.get("models", {}).get(text_model)
+        if model_info is None:
+            raise ConfigError(f"models.json: no entry for llm.text_generation '{text_model}'")
+        if "type" not in model_info or "model" not in model_info:
+            raise ConfigError(f"models.json: '{text_model}' needs 'type' and 'model'")
+
+
+class ConfigStore:
+    """Holds the current ConfigSnapshot and swaps it when the files change."""
+
+    def __init__(self, profile_path: Path = DEFAULT_PROFILE_PATH, models_path: Optional[Path] = None):
+        self.profile_path = Path(profile_path)
+        self.models_path = Path(models_path) if models_path else self.profile_path.parent / "models.json"
+        self._current = ConfigSnapshot.load(self.profile_path, self.models_path)
+        self._seen_version = self._current.version
+        self._listeners: List[Callable[[ConfigSnapshot, ConfigSnapshot], Any]] = []
+        self._watcher: Optional[asyncio.Task] = None
+
+    @property
+    def current(self) -> ConfigSnapshot:
+        return self._current
+
+    def subscribe(self, listener: Callable[[ConfigSnapshot, ConfigSnapshot], Any]):
+        """listener(old, new) is called after each successful swap."""
+        self._listeners.append(listener)
+
+    def reload(self) -> bool:
+        """Reload if either file changed. Returns True if a new snapshot was swapped in."""
+        version = files_version([str(self.profile_path), str(self.models_path)])
+        if version == self._seen_version:
+            return False
+        # Remember it even if it fails, so the same broken edit isn't re-parsed every poll
+        self._seen_version = version
+        try:
+            snapshot = ConfigSnapshot.load(self.profile_path, self.models_path)
+        except Exception as e:
+            print(f"[config] ⚠️ Keeping previous config, reload failed: {e}")
+            return False
+
+        old, self._current = self._current, snapshot
+        print(f"[config] Reloaded {self.profile_path.name} / {self.models_path.name}")
+        for listener in self._listeners:
+            try:
+                listener(old, snapshot)
+            except Exception as e:
+                print(f"[config] ⚠️ Reload listener failed: {e}")
+        return True
+
+    def start_watching(self, interval: float = 2.0):
+        if self._watcher is None or self._watcher.done():
+            self._watcher = asyncio.create_task(self._watch(interval))
+
+    async def _watch(self, interval: float):
+        while True:
+            await asyncio.sleep(interval)
+            self.reload()
+
+    def stop_watching(self):
+        if self._watcher is not None:
+            self._watcher.cancel()
+            self._watcher = None
+
+
+@functools.lru_cache(maxsize=None)
+def _store_for(profile_path: Path) -> ConfigStore:
+    return ConfigStore(profile_path)
+
+
+def shared_config(profile_path: Optional[Path] = None) -> ConfigStore:
+    """Process-wide ConfigStore for a profiles.yaml (models.json is read from the same folder)."""
+    return _store_for(Path(profile_path or DEFAULT_PROFILE_PATH).resolve())
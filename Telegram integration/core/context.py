@@ -23,21 +23,26 @@
 
 from typing import List, Optional, Dict, Any
 from modules.memory import MemoryManager, MemoryItem
+from modules.prompt_budget import PromptBudget
 from pathlib import Path
-import yaml
+from core.config import ConfigSnapshot, shared_config
 import time
 import uuid
 
 class AgentProfile:
-    def __init__(self, config_path: str = "config/profiles.yaml"):
-        with open(config_path, "r") as f:
-            config = yaml.safe_load(f)
+    def __init__(self, config_path: str = "config/profiles.yaml", snapshot: Optional[ConfigSnapshot] = None):
+        # Read from the shared parsed snapshot; no disk access per request
+        snapshot = snapshot or shared_config(Path(config_path)).current
+        config = snapshot.profile
 
         self.name = config["agent"]["name"]
         self.id = config["agent"]["id"]
         self.description = config["agent"]["description"]
         self.strategy = config["strategy"]["type"]
         self.max_steps = config["strategy"]["max_steps"]
+        self.planning_mode = config["strategy"].get("planning_mode", "two_call")
+        self.max_parallel_calls = config["strategy"].get("max_parallel_calls", 4)
+        self.prompt_budget = PromptBudget.from_config(config.get("prompt_budget"))
 
         self.memory_config = config["memory"]
         self.llm_config = config["llm"]
@@ -64,6 +69,7 @@ class AgentContext:
         )
         self.memory_trace: List[MemoryItem] = []
         self.tool_calls: List[ToolCallTrace] = []
+        self.prefetched: Dict[str, Any] = {}  # plan line → tool response (or exception) run ahead by explore_all
         self.final_answer: Optional[str] = None
 
     def add_tool_trace(self, name: str, args: Dict[str, Any], result: Any):
@@ -1,20 +1,49 @@
 # core/loop.py
 
 import asyncio
-from core.context import AgentContext
-from core.session import MultiMCP
+from core.context import AgentContext, AgentProfile
+from core.session import MultiMCP, ToolTimeoutError, ServerUnavailableError
+from core.metrics import metrics
+from core.tracing import tracer
 from core.strategy import decide_next_action
 from modules.perception import extract_perception, PerceptionResult
-from modules.action import ToolCallResult, parse_function_call
+from modules.action import ToolCallResult, parse_function_call, parse_function_calls, tool_result_text
+from modules.decision import generate_fused_plan
+from modules.prompt_budget import relevant_excerpt, summarize_tools_within
 from modules.memory import MemoryItem
 import json
+import time
+import inspect
+from typing import Optional, Callable, Any
+
+# Progress callback: on_event(kind, data). Kinds: step_started, perception,
+# tool_chosen, tool_finished, final_answer. May be sync or async.
+EventCallback = Callable[[str, dict], Any]
 
 
 class AgentLoop:
-    def __init__(self, user_input: str, dispatcher: MultiMCP):
-        self.context = AgentContext(user_input)
+    def __init__(
+        self,
+        user_input: str,
+        dispatcher: MultiMCP,
+        profile: Optional[AgentProfile] = None,
+        on_event: Optional[EventCallback] = None,
+    ):
+        self.context = AgentContext(user_input, profile=profile)
         self.mcp = dispatcher
         self.tools = dispatcher.get_all_tools()
+        self.on_event = on_event
+
+    async def emit(self, kind: str, **data):
+        """Report progress to on_event; a failing listener never breaks the run."""
+        if not self.on_event:
+            return
+        try:
+            result = self.on_event(kind, data)
+            if inspect.isawaitable(result):
+                await result
+        except Exception as e:
+            print(f"[loop] ⚠️ Progress listener failed on {kind}: {e}")
 
     def tool_expects_input(self, tool_name: str) -> bool:
         tool = next((t for t in self.tools if getattr(t, "name", None) == tool_name), None)
@@ -25,6 +54,67 @@ class AgentLoop:
 
     
 
+    def tool_input_for(self, tool_name: str, arguments: dict) -> dict:
+        if self.tool_expects_input(tool_name):
+            return {'input': arguments} if not (isinstance(arguments, dict) and 'input' in arguments) else arguments
+        return arguments
+
+    async def call_tool(self, tool_name: str, tool_input: dict):
+        started = time.perf_counter()
+        try:
+            with tracer.span(f"tool:{tool_name}", arguments=tool_input):
+                response = await self.mcp.call_tool(tool_name, tool_input)
+        except Exception:
+            metrics.observe(f"tool:{tool_name}", time.perf_counter() - started, error=True)
+            raise
+        metrics.observe(f"tool:{tool_name}", time.perf_counter() - started,
+                        error=bool(getattr(response, "isError", False)))
+        return response
+
+    async def prefetch(self, plan: str):
+        """Run a candidate plan's tool call ahead of time (explore_all); the loop reuses it if that plan wins."""
+        tool_name, arguments = parse_function_call(plan)
+        try:
+            response = await self.call_tool(tool_name, self.tool_input_for(tool_name, arguments))
+        except Exception as e:
+            self.context.prefetched[plan] = e
+            raise
+        self.context.prefetched[plan] = response
+        return response
+
+    async def run_calls(self, plan: str, calls: list) -> list:
+        """Run a step's calls concurrently (MultiMCP.call_tools); results (or exceptions) come back in order."""
+        if len(calls) == 1:
+            tool_name, arguments = calls[0]
+            prefetched = self.context.prefetched.pop(plan, None)
+            if isinstance(prefetched, Exception):
+                raise prefetched
+            if prefetched is None:
+                prefetched = await self.call_tool(tool_name, self.tool_input_for(tool_name, arguments))
+            return [prefetched]
+
+        started = time.perf_counter()
+        batch = [(tool_name, self.tool_input_for(tool_name, arguments)) for tool_name, arguments in calls]
+        with tracer.span("tools", calls=[tool_name for tool_name, _ in batch]):
+            responses = await self.mcp.call_tools(batch)
+        for (tool_name, _), response in zip(batch, responses):
+            metrics.observe(f"tool:{tool_name}", time.perf_counter() - started,
+                            error=isinstance(response, Exception) or bool(getattr(response, "isError", False)))
+        return responses
+
+    async def retrieve_memory(self, query: str):
+        # Embedding is a blocking HTTP call; keep it off the event loop shared by all chats
+        with metrics.timer("memory_retrieval"), tracer.span("memory_retrieval"):
+            retrieved = await asyncio.to_thread(
+                self.context.memory.retrieve,
+                query=query,
+                top_k=self.context.agent_profile.memory_config["top_k"],
+                type_filter=self.context.agent_profile.memory_config.get("type_filter", None),
+                session_filter=self.context.session_id
+            )
+        print(f"[memory] Retrieved {len(retrieved)} memories")
+        return retrieved
+
     async def run(self) -> str:
         print(f"[agent] Starting session: {self.context.session_id}")
 
@@ -34,69 +124,95 @@ class AgentLoop:
 
             for step in range(max_steps):
                 self.context.step = step
+                self.context.prefetched.clear()
                 print(f"[loop] Step {step + 1} of {max_steps}")
-
-                # 🧠 Perception
-                perception_raw = await extract_perception(query)
+                await self.emit("step_started", step=step + 1, max_steps=max_steps)
+
+                # ⚡ Fused mode: perception + plan in one LLM call
+                fused = None
+                retrieved = None
+                if self.context.agent_profile.planning_mode == "fused":
+                    retrieved = await self.retrieve_memory(query)
+                    with metrics.timer("fused_planning"), tracer.span("fused_planning", step=step + 1):
+                        fused = await generate_fused_plan(
+                            user_input=query,
+                            memory_items=retrieved,
+                            tool_descriptions=summarize_tools_within(
+                                self.tools, query, self.context.agent_profile.prompt_budget.tools
+                            ),
+                            step_num=step + 1,
+                            max_steps=max_steps,
+                            budget=self.context.agent_profile.prompt_budget
+                        )
+                    if fused is None:
+                        print("[plan] ⚠️ Fused output unparseable, falling back to perception + planning")
+
+                if fused:
+                    perception, plan = fused
+                    print(f"[perception] Intent: {perception.intent}, Hint: {perception.tool_hint}")
+                    await self.emit("perception", intent=perception.intent, tool_hint=perception.tool_hint)
+                else:
+                    # 🧠 Perception
+                    with metrics.timer("perception"), tracer.span("perception", step=step + 1):
+                        perception_raw = await extract_perception(query)
 
 
-                # ✅ Exit cleanly on FINAL_ANSWER
-                # ✅ Handle string outputs safely before trying to parse
-                if isinstance(perception_raw, str):
-                    pr_str = perception_raw.strip()
+                    # ✅ Exit cleanly on FINAL_ANSWER
+                    # ✅ Handle string outputs safely before trying to parse
+                    if isinstance(perception_raw, str):
+                        pr_str = perception_raw.strip()
                     
-                    # Clean exit if it's a FINAL_ANSWER
-                    if pr_str.startswith("FINAL_ANSWER:"):
-                        self.context.final_answer = pr_str
-                        break
-
-                    # Detect LLM echoing the prompt
-                    if "Your last tool produced this result" in pr_str or "Original user task:" in pr_str:
-                        print("[perception] ⚠️ LLM likely echoed prompt. No actionable plan.")
-                        self.context.final_answer = "FINAL_ANSWER: [no result]"
-                        break
-
-                    # Try to decode stringified JSON if it looks valid
-                    try:
-                        perception_raw = json.loads(pr_str)
-                    except json.JSONDecodeError:
-                        print("[perception] ⚠️ LLM response was neither valid JSON nor actionable text.")
-                        self.context.final_answer = "FINAL_ANSWER: [no result]"
-                        break
-
-
-                # ✅ Try parsing PerceptionResult
-                if isinstance(perception_raw, PerceptionResult):
-                    perception = perception_raw
-                else:
-                    try:
-                        # Attempt to parse stringified JSON if needed
-                        if isinstance(perception_raw, str):
-                            perception_raw = json.loads(perception_raw)
-                        perception = PerceptionResult(**perception_raw)
-                    except Exception as e:
-                        print(f"[perception] ⚠️ LLM perception failed: {e}")
-                        print(f"[perception] Raw output: {perception_raw}")
-                        break
-
-                print(f"[perception] Intent: {perception.intent}, Hint: {perception.tool_hint}")
-
-                # 💾 Memory Retrieval
-                retrieved = self.context.memory.retrieve(
-                    query=query,
-                    top_k=self.context.agent_profile.memory_config["top_k"],
-                    type_filter=self.context.agent_profile.memory_config.get("type_filter", None),
-                    session_filter=self.context.session_id
-                )
-                print(f"[memory] Retrieved {len(retrieved)} memories")
-
-                # 📊 Planning (via strategy)
-                plan = await decide_next_action(
-                    context=self.context,
-                    perception=perception,
-                    memory_items=retrieved,
-                    all_tools=self.tools
-                )
+                        # Clean exit if it's a FINAL_ANSWER
+                        if pr_str.startswith("FINAL_ANSWER:"):
+                            self.context.final_answer = pr_str
+                            break
+
+                        # Detect LLM echoing the prompt
+                        if "Your last tool produced this result" in pr_str or "Original user task:" in pr_str:
+                            print("[perception] ⚠️ LLM likely echoed prompt. No actionable plan.")
+                            self.context.final_answer = "FINAL_ANSWER: [no result]"
+                            break
+
+                        # Try to decode stringified JSON if it looks valid
+                        try:
+                            perception_raw = json.loads(pr_str)
+                        except json.JSONDecodeError:
+                            print("[perception] ⚠️ LLM response was neither valid JSON nor actionable text.")
+                            self.context.final_answer = "FINAL_ANSWER: [no result]"
+                            break
+
+
+                    # ✅ Try parsing PerceptionResult
+                    if isinstance(perception_raw, PerceptionResult):
+                        perception = perception_raw
+                    else:
+                        try:
+                            # Attempt to parse stringified JSON if needed
+                            if isinstance(perception_raw, str):
+                                perception_raw = json.loads(perception_raw)
+                            perception = PerceptionResult(**perception_raw)
+                        except Exception as e:
+                            print(f"[perception] ⚠️ LLM perception failed: {e}")
+                            print(f"[perception] Raw output: {perception_raw}")
+                            break
+
+                    print(f"[perception] Intent: {perception.intent}, Hint: {perception.tool_hint}")
+                    await self.emit("perception", intent=perception.intent, tool_hint=perception.tool_hint)
+
+                    # 💾 Memory Retrieval
+                    if retrieved is None:
+                        retrieved = await self.retrieve_memory(query)
+
+                    # 📊 Planning (via strategy)
+                    with metrics.timer("planning"), tracer.span("planning", step=step + 1):
+                        plan = await decide_next_action(
+                            context=self.context,
+                            perception=perception,
+                            memory_items=retrieved,
+                            all_tools=self.tools,
+                            run_plan=self.prefetch,
+                            is_idempotent=self.mcp.is_idempotent
+                        )
                 print(f"[plan] {plan}")
 
                 if "FINAL_ANSWER:" in plan:
@@ -109,49 +225,80 @@ class AgentLoop:
                     break
 
 
-                # ⚙️ Tool Execution
+                # ⚙️ Tool Execution (several independent calls run concurrently)
                 try:
-                    tool_name, arguments = parse_function_call(plan)
-
-                    if self.tool_expects_input(tool_name):
-                        tool_input = {'input': arguments} if not (isinstance(arguments, dict) and 'input' in arguments) else arguments
+                    with tracer.span("parse_arguments"):
+                        calls = parse_function_calls(plan)
+                    max_calls = self.context.agent_profile.max_parallel_calls
+                    if len(calls) > max_calls:
+                        print(f"[loop] ⚠️ Plan has {len(calls)} calls, running the first {max_calls}")
+                        calls = calls[:max_calls]
+
+                    for tool_name, arguments in calls:
+                        await self.emit("tool_chosen", step=step + 1, tool=tool_name, arguments=arguments)
+                    started = time.perf_counter()
+                    responses = await self.run_calls(plan, calls)
+
+                    # A single failed call keeps the old behaviour; in a batch, failures become results
+                    failures = [r for r in responses if isinstance(r, Exception)]
+                    if len(failures) == len(responses):
+                        raise failures[0]
+
+                    results = []
+                    for (tool_name, arguments), response in zip(calls, responses):
+                        if isinstance(response, Exception):
+                            result_str = f"[call failed: {response}]"
+                        else:
+                            result_str = tool_result_text(response)
+                        print(f"[action] {tool_name} → {result_str}")
+                        await self.emit("tool_finished", step=step + 1, tool=tool_name, seconds=time.perf_counter() - started)
+
+                        # 🧠 Add memory
+                        memory_item = MemoryItem(
+                            text=f"{tool_name}({arguments}) → {result_str}",
+                            type="tool_output",
+                            tool_name=tool_name,
+                            user_query=query,
+                            tags=[tool_name],
+                            session_id=self.context.session_id
+                        )
+                        with tracer.span("memory_add", tool=tool_name):
+                            await asyncio.to_thread(self.context.add_memory, memory_item)
+                        results.append((tool_name, arguments, result_str))
+
+                    # Only the parts of each result relevant to the task go into the next prompt
+                    share = self.context.agent_profile.prompt_budget.tool_result // len(results)
+                    results = [
+                        (name, args, relevant_excerpt(text, self.context.user_input, share))
+                        for name, args, text in results
+                    ]
+                    if len(results) == 1:
+                        produced = f"Your last tool produced this result:\n\n    {results[0][2]}"
                     else:
-                        tool_input = arguments
-
-                    response = await self.mcp.call_tool(tool_name, tool_input)
-
-                    # ✅ Safe TextContent parsing
-                    raw = getattr(response.content, 'text', str(response.content))
-                    try:
-                        result_obj = json.loads(raw) if raw.strip().startswith("{") else raw
-                    except json.JSONDecodeError:
-                        result_obj = raw
-
-                    result_str = result_obj.get("markdown") if isinstance(result_obj, dict) else str(result_obj)
-                    print(f"[action] {tool_name} → {result_str}")
-
-                    # 🧠 Add memory
-                    memory_item = MemoryItem(
-                        text=f"{tool_name}({arguments}) → {result_str}",
-                        type="tool_output",
-                        tool_name=tool_name,
-                        user_query=query,
-                        tags=[tool_name],
-                        session_id=self.context.session_id
-                    )
-                    self.context.add_memory(memory_item)
+                        listed = "\n\n    ".join(f"- {name}({args}) → {text}" for name, args, text in results)
+                        produced = f"Your last {len(results)} tool calls produced these results:\n\n    {listed}"
 
                     # 🔁 Next query
                     query = f"""Original user task: {self.context.user_input}
 
-    Your last tool produced this result:
-
-    {result_str}
+    {produced}
 
     If this fully answers the task, return:
     FINAL_ANSWER: your answer
 
     Otherwise, return the next FUNCTION_CALL."""
+                except (ToolTimeoutError, ServerUnavailableError) as e:
+                    print(f"[error] {e}")
+
+                    # 🔁 Let the planner route around the stuck tool
+                    query = f"""Original user task: {self.context.user_input}
+
+    Your last tool call failed: {e}
+
+    If you can already answer the task, return:
+    FINAL_ANSWER: your answer
+
+    Otherwise, return a FUNCTION_CALL using a different tool or arguments."""
                 except Exception as e:
                     print(f"[error] Tool execution failed: {e}")
                     break
@@ -159,6 +306,8 @@ class AgentLoop:
         except Exception as e:
             print(f"[agent] Session failed: {e}")
 
-        return self.context.final_answer or "FINAL_ANSWER: [no result]"
+        final_answer = self.context.final_answer or "FINAL_ANSWER: [no result]"
+        await self.emit("final_answer", answer=final_answer)
+        return final_answer
 
 
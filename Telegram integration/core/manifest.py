@@ -0,0 +1,64 @@
+# core/manifest.py → On-disk tool manifest cache
+# Role: Lets MultiMCP build its tool_map without spawning any server.
+
+# Each server entry is keyed by the content hash of its script and of models.py
+# (which defines the tool input schemas). Any edit to either file invalidates it.
+
+import json
+import hashlib
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+from mcp.types import Tool
+
+ROOT = Path(__file__).parent.parent
+DEFAULT_MANIFEST_PATH = ROOT / "cache" / "tool_manifest.json"
+
+
+def _file_digest(path: Path) -> str:
+    if not path.exists():
+        return "missing"
+    return hashlib.sha256(path.read_bytes()).hexdigest()
+
+
+class ToolManifestCache:
+    def __init__(self, path: Path = DEFAULT_MANIFEST_PATH):
+        self.path = Path(path)
+        self.entries: Dict[str, Dict[str, Any]] = {}
+        if self.path.exists():
+            try:
+                self.entries = json.loads(self.path.read_text())
+            except Exception as e:
+                print(f"[manifest] ⚠️ Ignoring unreadable manifest {self.path}: {e}")
+
+    def key_for(self, config: dict) -> str:
+        cwd = Path(config.get("cwd", "."))
+        script = Path(config["script"])
+        if not script.is_absolute():
+            script = cwd / script
+        digest = hashlib.sha256()
+        digest.update(_file_digest(script).encode())
+        digest.update(_file_digest(script.parent / "models.py").encode())
+        return digest.hexdigest()
+
+    def get(self, server_id: str, config: dict) -> Optional[List[Tool]]:
+        entry = self.entries.get(server_id)
+        if not entry or entry.get("key") != self.key_for(config):
+            return None
+        try:
+            return [Tool.model_validate(tool) for tool in entry["tools"]]
+        except Exception as e:
+            print(f"[manifest] ⚠️ Invalid cached tools for {server_id}: {e}")
+            return None
+
+    def put(self, server_id: str, config: dict, tools: List[Any]):
+        self.entries[server_id] = {
+            "key": self.key_for(config),
+            "script": config["script"],
+            "tools": [tool.model_dump(mode="json", exclude_none=True) for tool in tools],
+        }
+
+    def save(self):
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = self.path.with_suffix(".tmp")
+        tmp.write_text(json.dumps(self.entries, indent=2))
+        tmp.replace(self.path)
@@ -0,0 +1,88 @@
+# core/metrics.py → In-process latency histograms
+# Role: Rolling per-stage latency percentiles and counters for a long-running host.
+
+# AgentLoop records perception, memory retrieval, planning and each tool call
+# (as "tool:<name>"); the Telegram bot records the whole agent run, Excel export
+# and email. Recording is an append to a bounded deque, so it's cheap enough to
+# leave on; percentiles are only computed when a snapshot is requested.
+
+import time
+from collections import deque
+from contextlib import contextmanager
+from typing import Any, Deque, Dict, Iterator, Tuple
+
+
+def _percentile(sorted_values, q: float) -> float:
+    if not sorted_values:
+        return 0.0
+    idx = min(len(sorted_values) - 1, int(round(q * (len(sorted_values) - 1))))
+    return sorted_values[idx]
+
+
+class LatencyHistogram:
+    """Last `window` samples no older than `max_age` seconds, plus lifetime totals."""
+
+    def __init__(self, window: int = 512, max_age: float = 900.0):
+        self.max_age = max_age
+        self._samples: Deque[Tuple[float, float]] = deque(maxlen=window)  # (recorded_at, seconds)
+        self.count = 0
+        self.errors = 0
+
+    def observe(self, seconds: float, error: bool = False):
+        self._samples.append((time.monotonic(), seconds))
+        self.count += 1
+        if error:
+            self.errors += 1
+
+    def snapshot(self) -> Dict[str, Any]:
+        cutoff = time.monotonic() - self.max_age
+        values = sorted(s for t, s in self._samples if t >= cutoff)
+        return {
+            "count": self.count,
+            "errors": self.errors,
+            "window": len(values),
+            "p50": _percentile(values, 0.50),
+            "p95": _percentile(values, 0.95),
+            "p99": _percentile(values, 0.99),
+            "max": values[-1] if values else 0.0,
+        }
+
+
+class Metrics:
+    def __init__(self, window: int = 512, max_age: float = 900.0):
+        self.window = window
+        self.max_age = max_age
+        self.started = time.time()
+        self._stages: Dict[str, LatencyHistogram] = {}
+        self._counters: Dict[str, int] = {}
+
+    def observe(self, stage: str, seconds: float, error: bool = False):
+        hist = self._stages.get(stage)
+        if hist is None:
+            hist = self._stages[stage] = LatencyHistogram(self.window, self.max_age)
+        hist.observe(seconds, error)
+
+    @contextmanager
+    def timer(self, stage: str) -> Iterator[None]:
+        """Time a block; an exception escaping it counts as an error for the stage."""
+        started = time.perf_counter()
+        try:
+            yield
+        except BaseException:
+            self.observe(stage, time.perf_counter() - started, error=True)
+            raise
+        self.observe(stage, time.perf_counter() - started)
+
+    def incr(self, name: str, amount: int = 1):
+        self._counters[name] = self._counters.get(name, 0) + amount
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            "uptime": time.time() - self.started,
+            "counters": dict(self._counters),
+            "stages": {name: hist.snapshot() for name, hist in sorted(self._stages.items())},
+        }
+
+
+# Process-wide registry shared by AgentLoop and the bot
+metrics = Metrics()
@@ -0,0 +1,87 @@
+# core/result_cache.py → Tool result cache
+# Role: Serves repeated idempotent tool calls (same tool + same arguments) from memory.
+
+# Policy comes from profiles.yaml: a server-level `cache_ttl` applies to all its
+# tools, a tool's own `cache_ttl` overrides it (0 = not cacheable), and
+# `cache_depends_on` lists files (relative to the server cwd) whose change
+# invalidates the tool's entries, e.g. the FAISS index for search_documents.
+
+import os
+import json
+import time
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+
+
+def canonical_key(tool_name: str, arguments: dict) -> str:
+    return f"{tool_name}:{json.dumps(arguments, sort_keys=True, separators=(',', ':'), default=str)}"
+
+
+def files_version(paths: List[str], cwd: str = ".") -> Tuple:
+    """Cheap version stamp for a set of files: (mtime_ns, size) of each, or None if missing."""
+    version = []
+    for path in paths:
+        try:
+            stat = os.stat(os.path.join(cwd, path))
+            version.append((stat.st_mtime_ns, stat.st_size))
+        except OSError:
+            version.append(None)
+    return tuple(version)
+
+
+class ToolResultCache:
+    """Bounded LRU cache with a TTL and an optional version stamp per entry."""
+
+    def __init__(self, max_entries: int = 256):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, Tuple[float, Any, Any]]" = OrderedDict()  # key → (expires_at, version, result)
+        self.hits: Dict[str, int] = {}
+        self.misses: Dict[str, int] = {}
+        self.evictions = 0
+
+    def get(self, tool_name: str, arguments: dict, version: Any = None) -> Optional[Any]:
+        key = canonical_key(tool_name, arguments)
+        entry = self._entries.get(key)
+        if entry is not None:
+            expires_at, entry_version, result = entry
+            if expires_at > time.monotonic() and entry_version == version:
+                self._entries.move_to_end(key)
+                self.hits[tool_name] = self.hits.get(tool_name, 0) + 1
+                return result
+            del self._entries[key]
+
+        self.misses[tool_name] = self.misses.get(tool_name, 0) + 1
+        return None
+
+    def put(self, tool_name: str, arguments: dict, result: Any, ttl: float, version: Any = None):
+        key = canonical_key(tool_name, arguments)
+        self._entries[key] = (time.monotonic() + ttl, version, result)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def invalidate(self, tool_name: Optional[str] = None):
+        if tool_name is None:
+            self._entries.clear()
+            return
+        prefix = f"{tool_name}:"
+        for key in [k for k in self._entries if k.startswith(prefix)]:
+            del self._entries[key]
+
+    def stats(self) -> Dict[str, Any]:
+        tools = sorted(set(self.hits) | set(self.misses))
+        per_tool = {}
+        for tool in tools:
+            hits, misses = self.hits.get(tool, 0), self.misses.get(tool, 0)
+            per_tool[tool] = {"hits": hits, "misses": misses, "hit_rate": hits / (hits + misses)}
+        total_hits, total_misses = sum(self.hits.values()), sum(self.misses.values())
+        return {
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "evictions": self.evictions,
+            "hits": total_hits,
+            "misses": total_misses,
+            "hit_rate": total_hits / (total_hits + total_misses) if total_hits + total_misses else 0.0,
+            "tools": per_tool,
+        }
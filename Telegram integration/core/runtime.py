@@ -0,0 +1,63 @@
+# core/runtime.py → Long-lived agent runtime
+# Role: Holds everything an AgentLoop needs that should outlive a single request,
+# so a long-running host (the Telegram bot) pays the setup cost once.
+
+# Holds: the shared config store, one MultiMCP (tool map + pooled server
+# sessions) and the shared ModelManager. Each run gets an AgentProfile built
+# from the config snapshot current at its start, so profile edits apply to the
+# next request without a restart.
+
+from pathlib import Path
+from typing import Any, Mapping, Optional
+from core.config import ConfigSnapshot, shared_config, thaw
+from core.context import AgentProfile
+from core.loop import AgentLoop, EventCallback
+from core.session import MultiMCP
+from core.tracing import tracer
+from modules.model_manager import ModelManager, shared_model_manager
+
+
+class AgentRuntime:
+    def __init__(self, config_path: Path):
+        self.config_path = Path(config_path)
+        self.config_store = shared_config(self.config_path)
+        self.config_store.subscribe(self._on_reload)
+        # Server processes are long-lived; mcp_servers changes still need a restart
+        self.mcp = MultiMCP(server_configs=thaw(self.config.get("mcp_servers", ())))
+        self.model: ModelManager = shared_model_manager()
+        self.started = False
+
+    @property
+    def config(self) -> Mapping[str, Any]:
+        return self.config_store.current.profile
+
+    @property
+    def profile(self) -> AgentProfile:
+        return AgentProfile(snapshot=self.config_store.current)
+
+    def _on_reload(self, old: ConfigSnapshot, new: ConfigSnapshot):
+        if old.profile.get("mcp_servers") != new.profile.get("mcp_servers"):
+            print("[runtime] ⚠️ mcp_servers changed; restart to apply server changes")
+
+    async def start(self):
+        self.config_store.start_watching()
+        await self.mcp.initialize()
+        self.started = True
+        print(f"[runtime] Ready with {len(self.mcp.tool_map)} tools from {len(self.mcp.server_configs)} servers")
+
+    def new_loop(self, user_input: str, on_event: Optional[EventCallback] = None) -> AgentLoop:
+        return AgentLoop(user_input=user_input, dispatcher=self.mcp, profile=self.profile, on_event=on_event)
+
+    async def run(self, user_input: str, on_event: Optional[EventCallback] = None) -> str:
+        if not self.started:
+            await self.start()
+        loop = self.new_loop(user_input, on_event)
+        # One trace track per agent session
+        with tracer.track(loop.context.session_id), tracer.span("agent.run", user_input=user_input[:200]):
+            return await loop.run()
+
+    async def shutdown(self):
+        self.config_store.stop_watching()
+        await self.mcp.shutdown()
+        tracer.close()
+        self.started = False
@@ -2,9 +2,18 @@
 
 import os
 import sys
-from typing import Optional, Any, List, Dict
-from mcp import ClientSession, StdioServerParameters
+import time
+import json
+import asyncio
+import importlib.util
+import anyio
+from contextlib import nullcontext
+from typing import Optional, Any, List, Dict, Tuple
+from mcp import ClientSession, StdioServerParameters, types
 from mcp.client.stdio import stdio_client
+from core.manifest import ToolManifestCache
+from core.result_cache import ToolResultCache, files_version
+from core.tracing import tracer
 
 
 class MCP:
@@ -47,67 +56,812 @@ class MCP:
                 return await session.call_tool(tool_name, arguments=arguments)
 
 
+class ToolTimeoutError(Exception):
+    """A tool call exceeded its deadline and was cancelled."""
+
+
+class ServerUnavailableError(Exception):
+    """The tool's server circuit is open; the call failed fast without reaching it."""
+
+
+def _config_cwd(config: dict) -> str:
+    return config.get("cwd", os.getcwd())
+
+
+def _server_params(config: dict, replica: Optional[int] = None) -> StdioServerParameters:
+    return StdioServerParameters(
+        command=sys.executable,
+        args=[config["script"]],
+        cwd=_config_cwd(config),
+        env={"MCP_REPLICA_INDEX": str(replica)} if replica is not None else None
+    )
+
+
+def _is_connection_error(error: BaseException) -> bool:
+    """True if the error means the stdio transport is gone (not a tool failure)."""
+    if isinstance(error, (anyio.ClosedResourceError, anyio.BrokenResourceError, anyio.EndOfStream, ConnectionError)):
+        return True
+    return "connection closed" in str(error).lower()
+
+
+def _is_idempotent(config: dict, tool_name: str) -> bool:
+    """`idempotent` under the server's `tools:` section, else the server's `idempotent` (default False)."""
+    policy = (config.get("tools") or {}).get(tool_name) or {}
+    return bool(policy.get("idempotent", config.get("idempotent", False)))
+
+
+class PersistentMCP:
+    """
+    Long-lived stdio session to one MCP server process (one replica).
+    The subprocess and ClientSession are owned by a dedicated task so the
+    anyio context managers are entered and exited from the same task.
+    At most max_concurrency calls are sent to the process at once.
+
+    If the transport dies mid-call, the first caller to notice reconnects
+    (`generation` tells callers whether the session they used was already
+    replaced). The call is retried on the new session only for tools marked
+    `idempotent`; for the rest the error is raised, since the server may have
+    run the tool before dying.
+    """
+
+    def __init__(self, config: dict, replica: int = 0, max_concurrency: int = 4):
+        self.config = config
+        self.replica = replica
+        self._slots = asyncio.Semaphore(max_concurrency)
+        self.session: Optional[ClientSession] = None
+        self._task: Optional[asyncio.Task] = None
+        self._ready: Optional[asyncio.Event] = None
+        self._closing: Optional[asyncio.Event] = None
+        self._error: Optional[BaseException] = None
+        self._lock = asyncio.Lock()
+        self.generation = 0  # incremented on each successful start
+        self._waiting: Dict[int, int] = {}  # generation → calls awaiting a response from that session
+        self.inflight = 0
+        self.last_used = time.monotonic()
+
+    @property
+    def alive(self) -> bool:
+        return self.session is not None and self._task is not None and not self._task.done()
+
+    async def start(self):
+        async with self._lock:
+            await self._start_locked()
+
+    async def _start_locked(self):
+        if self.alive:
+            return
+        await self._stop_locked()
+
+        self._ready = asyncio.Event()
+        self._closing = asyncio.Event()
+        self._error = None
+        self._task = asyncio.create_task(self._run())
+        await self._ready.wait()
+
+        if not self.alive:
+            raise ConnectionError(f"Could not start MCP server {self.config['script']}: {self._error}")
+        self.generation += 1
+
+    async def reconnect(self, generation: int):
+        """Replace the session of the given generation, unless another caller already has."""
+        async with self._lock:
+            if self.generation == generation:
+                # Tearing the session down cancels its receive loop, which may still be failing the
+                # other pending requests; give them a moment to get their error first
+                deadline = time.monotonic() + 2
+                while self._waiting.get(generation) and time.monotonic() < deadline:
+                    await asyncio.sleep(0.01)
+                await self._stop_locked()
+            await self._start_locked()
+
+    async def _run(self):
+        labels = {"server": self.config["script"], "replica": self.replica}
+        spawn = tracer.begin("mcp.spawn", **labels)
+        try:
+            async with stdio_client(_server_params(self.config, self.replica)) as (read, write):
+                tracer.end(spawn)
+                async with ClientSession(read, write) as session:
+                    with tracer.span("mcp.initialize", **labels):
+                        await session.initialize()
+                    self.session = session
+                    print(f"[mcp] Session ready: {self.config['script']} (replica {self.replica})")
+                    self._ready.set()
+                    await self._closing.wait()
+        except Exception as e:
+            self._error = e
+            if not self._closing.is_set():
+                print(f"❌ Session error ({self.config['script']}): {e}")
+        finally:
+            self.session = None
+            self._ready.set()
+
+    async def list_tools(self) -> List[Any]:
+        self.inflight += 1
+        try:
+            await self.start()
+            tools_result = await self.session.list_tools()
+            return tools_result.tools
+        finally:
+            self.inflight -= 1
+            self.last_used = time.monotonic()
+
+    async def call_tool(self, tool_name: str, arguments: dict, timeout: Optional[float] = None) -> Any:
+        """The deadline (asyncio.TimeoutError) starts once a slot is free, so queueing doesn't count against it."""
+        self.inflight += 1
+        try:
+            async with self._slots:
+                return await asyncio.wait_for(self._call_in_slot(tool_name, arguments), timeout=timeout)
+        finally:
+            self.inflight -= 1
+            self.last_used = time.monotonic()
+
+    async def _call_in_slot(self, tool_name: str, arguments: dict) -> Any:
+        await self.start()
+        generation = self.generation
+        try:
+            return await self._send(generation, tool_name, arguments)
+        except Exception as e:
+            if not _is_connection_error(e):
+                raise
+            # Session died under us → reconnect once; retry only if the tool is safe to repeat
+            print(f"[mcp] Session for {self.config['script']} lost ({e}), reconnecting...")
+            await self.reconnect(generation)
+            if not _is_idempotent(self.config, tool_name):
+                raise ConnectionError(
+                    f"Session lost during '{tool_name}' (not retried, tool is not marked idempotent): {e}"
+                ) from e
+            return await self._send(self.generation, tool_name, arguments, retry=True)
+
+    async def _send(self, generation: int, tool_name: str, arguments: dict, retry: bool = False) -> Any:
+        self._waiting[generation] = self._waiting.get(generation, 0) + 1
+        try:
+            with tracer.span("mcp.call", tool=tool_name, replica=self.replica, retry=retry):
+                return await self.session.call_tool(tool_name, arguments)
+        finally:
+            self._waiting[generation] -= 1
+            if not self._waiting[generation]:
+                del self._waiting[generation]
+
+    async def stop(self):
+        async with self._lock:
+            await self._stop_locked()
+
+    async def stop_if_idle(self, idle_timeout: float) -> bool:
+        """Stop the server if it has no calls in flight and was unused for idle_timeout seconds."""
+        async with self._lock:
+            if not self.alive or self.inflight:
+                return False
+            if time.monotonic() - self.last_used < idle_timeout:
+                return False
+            await self._stop_locked()
+            return True
+
+    async def _stop_locked(self):
+        if self._task is None:
+            return
+        self._closing.set()
+        task, self._task = self._task, None
+        try:
+            await asyncio.wait_for(task, timeout=5)
+        except asyncio.TimeoutError:
+            task.cancel()
+        except asyncio.CancelledError:
+            task.cancel()
+            self.session = None
+            # Only swallow the session task's own cancellation; a caller's deadline must go through
+            if asyncio.current_task().cancelling():
+                raise
+        except Exception:
+            pass
+        self.session = None
+
+
+class ServerPool:
+    """
+    `replicas` copies of one configured server (profile keys `replicas`,
+    `max_concurrency`). Each call goes to the replica with the fewest calls in
+    flight; ties prefer a replica that is already running, so extra copies are
+    only spawned under concurrent load.
+    """
+
+    def __init__(self, config: dict):
+        self.config = config
+        replicas = max(1, int(config.get("replicas", 1)))
+        max_concurrency = max(1, int(config.get("max_concurrency", 4)))
+        self.replicas = [PersistentMCP(config, i, max_concurrency) for i in range(replicas)]
+
+    @property
+    def alive(self) -> bool:
+        return any(replica.alive for replica in self.replicas)
+
+    @property
+    def inflight(self) -> int:
+        return sum(replica.inflight for replica in self.replicas)
+
+    def _least_loaded(self) -> PersistentMCP:
+        return min(self.replicas, key=lambda r: (r.inflight, not r.alive, r.replica))
+
+    async def list_tools(self) -> List[Any]:
+        return await self._least_loaded().list_tools()
+
+    async def call_tool(self, tool_name: str, arguments: dict, timeout: Optional[float] = None) -> Any:
+        return await self._least_loaded().call_tool(tool_name, arguments, timeout=timeout)
+
+    async def stop_if_idle(self, idle_timeout: float) -> List[int]:
+        return [replica.replica for replica in self.replicas if await replica.stop_if_idle(idle_timeout)]
+
+    async def stop(self):
+        for replica in self.replicas:
+            await replica.stop()
+
+
+class InProcessMCP:
+    """
+    `transport: inprocess` — loads the server script as a module in the agent
+    process and calls its FastMCP tools directly, skipping the subprocess and
+    JSON-RPC round trip. Meant for pure, fast tools (e.g. mcp_server_1.py).
+    Results are wrapped in CallToolResult so callers see the stdio shape.
+    Tools listed under `stdio_tools` (code/shell execution) still run in a
+    pooled subprocess so they stay isolated from the agent process.
+
+    FastMCP runs sync tools on the calling event loop, so calls go through a
+    worker thread with its own loop; the agent's loop stays free and the
+    per-call deadline can fire. A timed-out call keeps its thread until the
+    tool returns, and C code that holds the GIL (math.factorial, big-int **)
+    still stalls the whole process. Tools whose cost grows with their input
+    belong in `stdio_tools`.
+    """
+
+    def __init__(self, config: dict):
+        self.config = config
+        self.app = None
+        self.stdio_tools = set(config.get("stdio_tools", []))
+        self.fallback = ServerPool(config)
+        self._inflight = 0
+
+    @property
+    def alive(self) -> bool:
+        return self.app is not None
+
+    @property
+    def inflight(self) -> int:
+        return self._inflight + self.fallback.inflight
+
+    def _load(self):
+        if self.app is not None:
+            return self.app
+        script = os.path.abspath(os.path.join(_config_cwd(self.config), self.config["script"]))
+        script_dir = os.path.dirname(script)
+        if script_dir not in sys.path:
+            sys.path.insert(0, script_dir)  # server scripts import siblings like models.py
+
+        module_name = f"_inprocess_{os.path.splitext(os.path.basename(script))[0]}"
+        spec = importlib.util.spec_from_file_location(module_name, script)
+        module = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(module)
+        self.app = getattr(module, self.config.get("app", "mcp"))
+        print(f"[mcp] Loaded in-process server: {self.config['script']}")
+        return self.app
+
+    async def list_tools(self) -> List[Any]:
+        return await self._load().list_tools()
+
+    async def call_tool(self, tool_name: str, arguments: dict, timeout: Optional[float] = None) -> Any:
+        if tool_name in self.stdio_tools:
+            return await self.fallback.call_tool(tool_name, arguments, timeout=timeout)
+
+        app = self._load()
+        self._inflight += 1
+        try:
+            result = await asyncio.wait_for(
+                asyncio.to_thread(asyncio.run, app.call_tool(tool_name, arguments)), timeout=timeout
+            )
+        except asyncio.TimeoutError:
+            raise
+        except Exception as e:
+            return types.CallToolResult(
+                content=[types.TextContent(type="text", text=str(e))],
+                isError=True
+            )
+        finally:
+            self._inflight -= 1
+
+        structured = None
+        if isinstance(result, tuple):  # newer FastMCP: (content, structured)
+            result, structured = result
+        if isinstance(result, dict):
+            structured = result
+            result = [types.TextContent(type="text", text=json.dumps(result))]
+        return types.CallToolResult(content=list(result), structuredContent=structured, isError=False)
+
+    async def stop_if_idle(self, idle_timeout: float) -> List[int]:
+        return await self.fallback.stop_if_idle(idle_timeout)  # the module itself stays imported
+
+    async def stop(self):
+        await self.fallback.stop()
+
+
+class ServerHealth:
+    """
+    Call count, error rate, latency and circuit state for one server.
+    closed → open after failure_threshold consecutive failures (exceptions or
+    timeouts, not tool-level isError results); open → half_open while a
+    background probe runs; back to closed when the probe succeeds.
+    """
+
+    def __init__(self, failure_threshold: int = 3, reset_timeout: float = 30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = "closed"
+        self.calls = 0
+        self.errors = 0
+        self.consecutive_failures = 0
+        self.latency_ewma: Optional[float] = None
+        self.last_error: Optional[str] = None
+        self.opened_at: Optional[float] = None
+
+    @property
+    def available(self) -> bool:
+        return self.state == "closed"
+
+    def record(self, seconds: float, error: Optional[BaseException] = None) -> bool:
+        """Record one call; returns True if this call tripped the circuit open."""
+        self.calls += 1
+        self.latency_ewma = seconds if self.latency_ewma is None else 0.8 * self.latency_ewma + 0.2 * seconds
+        if error is None:
+            self.consecutive_failures = 0
+            return False
+
+        self.errors += 1
+        self.consecutive_failures += 1
+        self.last_error = str(error) or type(error).__name__
+        if self.state == "closed" and self.consecutive_failures >= self.failure_threshold:
+            self.state = "open"
+            self.opened_at = time.monotonic()
+            return True
+        return False
+
+    def close(self):
+        self.state = "closed"
+        self.consecutive_failures = 0
+        self.opened_at = None
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "state": self.state,
+            "calls": self.calls,
+            "errors": self.errors,
+            "error_rate": self.errors / self.calls if self.calls else 0.0,
+            "latency_ewma": self.latency_ewma,
+            "last_error": self.last_error,
+        }
+
+
 class MultiMCP:
     """
-    Stateless version: discovers tools from multiple MCP servers, but reconnects per tool call.
-    Each call_tool() uses a fresh session based on tool-to-server mapping.
+    Discovers tools from multiple MCP servers and routes each call by tool-to-server mapping.
+
+    pooled=True (default): one ServerPool per server, reused across calls and
+    AgentLoop runs until shutdown().
+    pooled=False: stateless, every call_tool() spawns a fresh session.
+
+    With a manifest cache (default), servers whose script and models.py are
+    unchanged are not spawned at all during initialize(); they start on the
+    first call to one of their tools. Pooled servers are reaped after
+    idle_timeout seconds without calls (per-server `idle_timeout` in the
+    profile overrides it; 0 keeps the server warm until shutdown()).
+
+    Every call has a deadline: the tool's `timeout` under the server's `tools:`
+    section, else the server's `call_timeout`, else call_timeout. It starts
+    once the call has a server slot (and a slot under the tool's own
+    `max_concurrency`, if set), so queueing is not a server failure. A tool with
+    `hedge_after` gets a second request if the first has not answered by then
+    (only if it is also marked `idempotent`); whichever succeeds first wins. A call
+    whose server process died mid-call is retried once after reconnecting only
+    if the tool is marked `idempotent` (per tool, or for the whole server).
+
+    Each server has a circuit breaker (`failure_threshold`, `reset_timeout`).
+    While it is open, calls fail fast with ServerUnavailableError, the server's
+    tools are hidden from get_all_tools(), and a background probe (list_tools,
+    or `probe_tool` with `probe_arguments`) decides when to close it again.
+
+    Results of cacheable tools (`cache_ttl`, see core/result_cache.py) are
+    served from result_cache before any of the above applies.
     """
 
-    def __init__(self, server_configs: List[dict]):
+    def __init__(
+        self,
+        server_configs: List[dict],
+        pooled: bool = True,
+        discovery_timeout: float = 30.0,
+        manifest: Optional[ToolManifestCache] = None,
+        use_manifest_cache: bool = True,
+        idle_timeout: float = 300.0,
+        reap_interval: float = 10.0,
+        call_timeout: float = 60.0,
+        result_cache: Optional[ToolResultCache] = None,
+    ):
         self.server_configs = server_configs
+        self.pooled = pooled
+        self.discovery_timeout = discovery_timeout
+        self.manifest = manifest or (ToolManifestCache() if use_manifest_cache else None)
+        self.server_status: Dict[str, Dict[str, Any]] = {}  # server id → {available, discovery_seconds, error}
         self.tool_map: Dict[str, Dict[str, Any]] = {}  # tool_name → {config, tool}
+        self.sessions: Dict[str, Any] = {}  # server id → ServerPool | InProcessMCP
+        self.idle_timeout = idle_timeout
+        self.reap_interval = reap_interval
+        self._reaper: Optional[asyncio.Task] = None
+        self.call_timeout = call_timeout
+        self.health: Dict[str, ServerHealth] = {
+            self._server_id(config): ServerHealth(
+                failure_threshold=config.get("failure_threshold", 3),
+                reset_timeout=config.get("reset_timeout", 30.0),
+            )
+            for config in server_configs
+        }
+        self._probes: Dict[str, asyncio.Task] = {}
+        self._tool_slots: Dict[str, asyncio.Semaphore] = {}  # tool name → its `max_concurrency` limit
+        for config in server_configs:
+            for tool_name, policy in (config.get("tools") or {}).items():
+                if (policy or {}).get("hedge_after") and not _is_idempotent(config, tool_name):
+                    print(f"[mcp] ⚠️ {tool_name}: hedge_after ignored, the tool is not marked idempotent")
+        self.result_cache = result_cache or ToolResultCache()
+
+    def _server_id(self, config: dict) -> str:
+        return config.get("id", config["script"])
+
+    def _in_process(self, config: dict) -> bool:
+        return config.get("transport", "stdio") == "inprocess"
+
+    def _uses_session(self, config: dict) -> bool:
+        return self.pooled or self._in_process(config)
+
+    def _pooled_session(self, config: dict) -> Any:
+        server_id = self._server_id(config)
+        if server_id not in self.sessions:
+            self.sessions[server_id] = InProcessMCP(config) if self._in_process(config) else ServerPool(config)
+        self._ensure_reaper()
+        return self.sessions[server_id]
+
+    def _ensure_reaper(self):
+        if self._reaper is None or self._reaper.done():
+            self._reaper = asyncio.create_task(self._reap_idle())
+
+    async def _reap_idle(self):
+        while True:
+            await asyncio.sleep(self.reap_interval)
+            for server_id, session in list(self.sessions.items()):
+                idle_timeout = session.config.get("idle_timeout", self.idle_timeout)
+                if not idle_timeout:
+                    continue
+                try:
+                    for replica in await session.stop_if_idle(idle_timeout):
+                        print(f"[mcp] Reaped idle server {server_id} (replica {replica}) after {idle_timeout}s")
+                except Exception as e:
+                    print(f"[mcp] ⚠️ Failed to reap {server_id}: {e}")
 
     async def initialize(self):
+        """
+        Build tool_map from the manifest cache where possible, and discover the
+        remaining servers concurrently. Each server gets its own timeout; a slow
+        or crashing server is marked unavailable in server_status without
+        holding up the others.
+        """
         print("in MultiMCP initialize")
+        started = time.perf_counter()
+
+        cached: Dict[str, List[Any]] = {}
+        if self.manifest:
+            for config in self.server_configs:
+                tools = self.manifest.get(self._server_id(config), config)
+                if tools is not None:
+                    cached[self._server_id(config)] = tools
+                    self.server_status[self._server_id(config)] = {
+                        "available": True,
+                        "discovery_seconds": 0.0,
+                        "error": None,
+                        "cached": True,
+                    }
+            if cached:
+                print(f"[mcp] Tool manifest cache hit: {list(cached.keys())}")
+
+        to_scan = [config for config in self.server_configs if self._server_id(config) not in cached]
+        scanned = await asyncio.gather(
+            *(self._discover_with_timeout(config) for config in to_scan)
+        )
+
+        if self.manifest:
+            for config, tools in zip(to_scan, scanned):
+                if self.server_status[self._server_id(config)]["available"]:
+                    self.manifest.put(self._server_id(config), config, tools)
+            if to_scan:
+                try:
+                    self.manifest.save()
+                except Exception as e:
+                    print(f"[manifest] ⚠️ Could not save tool manifest: {e}")
+
+        discovered = dict(zip((self._server_id(config) for config in to_scan), scanned))
+        discovered.update(cached)
         for config in self.server_configs:
-            try:
-                params = StdioServerParameters(
-                    command=sys.executable,
-                    args=[config["script"]],
-                    cwd=config.get("cwd", os.getcwd())
-                )
-                print(f"→ Scanning tools from: {config['script']} in {params.cwd}")
-                async with stdio_client(params) as (read, write):
-                    print("Connection established, creating session...")
-                    try:
-                        async with ClientSession(read, write) as session:
-                            print("[agent] Session created, initializing...")
-                            await session.initialize()
-                            print("[agent] MCP session initialized")
-                            tools = await session.list_tools()
-                            print(f"→ Tools received: {[tool.name for tool in tools.tools]}")
-                            for tool in tools.tools:
-                                self.tool_map[tool.name] = {
-                                    "config": config,
-                                    "tool": tool
-                                }
-                    except Exception as se:
-                        print(f"❌ Session error: {se}")
-            except Exception as e:
-                print(f"❌ Error initializing MCP server {config['script']}: {e}")
+            for tool in discovered.get(self._server_id(config), []):
+                self.tool_map[tool.name] = {
+                    "config": config,
+                    "tool": tool
+                }
 
-    async def call_tool(self, tool_name: str, arguments: dict) -> Any:
+        print(f"[mcp] Discovery finished in {time.perf_counter() - started:.2f}s")
+        for server_id, status in sorted(self.server_status.items(), key=lambda kv: -kv[1]["discovery_seconds"]):
+            state = "✅" if status["available"] else f"❌ {status['error']}"
+            print(f"  → {server_id}: {status['discovery_seconds']:.2f}s {state}")
+
+    async def _discover_with_timeout(self, config: dict) -> List[Any]:
+        server_id = self._server_id(config)
+        timeout = config.get("discovery_timeout", self.discovery_timeout)
+        started = time.perf_counter()
+        tools: List[Any] = []
+        error = None
+
+        try:
+            print(f"→ Scanning tools from: {config['script']}")
+            tools = await asyncio.wait_for(self._discover(config), timeout=timeout)
+            print(f"→ Tools received from {server_id}: {[tool.name for tool in tools]}")
+        except asyncio.TimeoutError:
+            error = f"timed out after {timeout}s"
+        except Exception as e:
+            error = str(e) or type(e).__name__
+
+        if error:
+            print(f"❌ Error initializing MCP server {config['script']}: {error}")
+            if server_id in self.sessions:
+                await self.sessions[server_id].stop()
+
+        self.server_status[server_id] = {
+            "available": error is None,
+            "discovery_seconds": time.perf_counter() - started,
+            "error": error,
+            "cached": False,
+        }
+        return tools
+
+    async def _discover(self, config: dict) -> List[Any]:
+        if self._uses_session(config):
+            return await self._pooled_session(config).list_tools()
+
+        async with stdio_client(_server_params(config)) as (read, write):
+            async with ClientSession(read, write) as session:
+                await session.initialize()
+                tools = await session.list_tools()
+                return tools.tools
+
+    def tool_policy(self, tool_name: str) -> Dict[str, Any]:
+        """Per-tool settings from the server's `tools:` section in profiles.yaml."""
+        entry = self.tool_map.get(tool_name)
+        if not entry:
+            return {}
+        return (entry["config"].get("tools") or {}).get(tool_name) or {}
+
+    def _timeout_for(self, tool_name: str) -> float:
+        config = self.tool_map[tool_name]["config"]
+        return self.tool_policy(tool_name).get("timeout", config.get("call_timeout", self.call_timeout))
+
+    def is_idempotent(self, tool_name: str) -> bool:
+        """Whether the profile marks the tool safe to run more than once (unknown tools are not)."""
+        entry = self.tool_map.get(tool_name)
+        return bool(entry) and _is_idempotent(entry["config"], tool_name)
+
+    async def call_tool(self, tool_name: str, arguments: dict, session: Optional[ClientSession] = None) -> Any:
+        """
+        Call a tool through the result cache, hedging and circuit breaker.
+        `session` is an open session to an unpooled server shared by a
+        call_tools() group; hedged calls still get their own processes.
+        """
         entry = self.tool_map.get(tool_name)
         if not entry:
             raise ValueError(f"Tool '{tool_name}' not found on any server.")
 
         config = entry["config"]
-        params = StdioServerParameters(
-            command=sys.executable,
-            args=[config["script"]],
-            cwd=config.get("cwd", os.getcwd())
-        )
+        policy = self.tool_policy(tool_name)
+        cache_ttl = policy.get("cache_ttl", config.get("cache_ttl", 0))
+        if cache_ttl:
+            version = files_version(policy.get("cache_depends_on", []), _config_cwd(config))
+            cached = self.result_cache.get(tool_name, arguments, version)
+            if cached is not None:
+                return cached
 
-        async with stdio_client(params) as (read, write):
-            async with ClientSession(read, write) as session:
-                await session.initialize()
-                return await session.call_tool(tool_name, arguments)
+        timeout = self._timeout_for(tool_name)
+        # A hedged request runs the tool twice; only allowed for tools marked idempotent
+        hedge_after = policy.get("hedge_after") if _is_idempotent(config, tool_name) else None
+        if hedge_after:
+            call = self._hedged_call(config, tool_name, arguments, hedge_after, timeout)
+        else:
+            call = self._dispatch(config, tool_name, arguments, timeout, session)
+        result = await self._guarded(tool_name, call, timeout)
+
+        if cache_ttl and not getattr(result, "isError", False):
+            self.result_cache.put(tool_name, arguments, result, cache_ttl, version)
+        return result
+
+    async def _guarded(self, tool_name: str, call, timeout: float) -> Any:
+        """
+        Apply the circuit breaker to one call and record its health. The call
+        enforces its own deadline (timeout), which starts only once it has a
+        server slot, so time spent queued is never counted as a server failure.
+        """
+        config = self.tool_map[tool_name]["config"]
+        server_id = self._server_id(config)
+        health = self.health[server_id]
+        if not health.available:
+            call.close()
+            raise ServerUnavailableError(f"Server '{server_id}' is unhealthy ({health.last_error}); '{tool_name}' not called.")
+
+        started = time.perf_counter()
+        try:
+            result = await call
+        except asyncio.TimeoutError:
+            error = ToolTimeoutError(f"Tool '{tool_name}' did not finish within {timeout}s and was cancelled.")
+            self._record(server_id, config, started, error)
+            raise error from None
+        except Exception as e:
+            self._record(server_id, config, started, e)
+            raise
+        self._record(server_id, config, started)
+        return result
+
+    def _record(self, server_id: str, config: dict, started: float, error: Optional[BaseException] = None):
+        if self.health[server_id].record(time.perf_counter() - started, error):
+            print(f"[mcp] ⚡ Circuit opened for {server_id}: {error}")
+            self._probes[server_id] = asyncio.create_task(self._probe_until_healthy(server_id, config))
+
+    async def _probe_until_healthy(self, server_id: str, config: dict):
+        health = self.health[server_id]
+        # Only tear down idle processes: calls still in flight on a healthy replica finish, and a
+        # hung process goes idle once its callers hit their deadlines (the probe respawns it)
+        if server_id in self.sessions:
+            await self.sessions[server_id].stop_if_idle(0)
+
+        while True:
+            await asyncio.sleep(health.reset_timeout)
+            health.state = "half_open"
+            try:
+                probe = self._dispatch(config, config["probe_tool"], config.get("probe_arguments", {})) \
+                    if config.get("probe_tool") else self._discover(config)
+                result = await asyncio.wait_for(probe, timeout=config.get("discovery_timeout", self.discovery_timeout))
+                if getattr(result, "isError", False):
+                    raise RuntimeError("probe tool returned an error")
+                health.close()
+                print(f"[mcp] ✅ Circuit closed for {server_id}, probe succeeded")
+                return
+            except Exception as e:
+                health.state = "open"
+                health.last_error = str(e) or type(e).__name__
+                print(f"[mcp] Probe for {server_id} failed: {health.last_error}")
+                if server_id in self.sessions:
+                    await self.sessions[server_id].stop_if_idle(0)
+
+    def _tool_slot(self, config: dict, tool_name: str):
+        """Semaphore for a tool with `max_concurrency` in its `tools:` section (e.g. long index jobs)."""
+        limit = ((config.get("tools") or {}).get(tool_name) or {}).get("max_concurrency")
+        if not limit:
+            return nullcontext()
+        if tool_name not in self._tool_slots:
+            self._tool_slots[tool_name] = asyncio.Semaphore(limit)
+        return self._tool_slots[tool_name]
+
+    async def _dispatch(self, config: dict, tool_name: str, arguments: dict, timeout: Optional[float] = None,
+                        session: Optional[ClientSession] = None) -> Any:
+        # Wait for the tool's own limit before taking a server slot, so queued jobs don't hold a replica
+        async with self._tool_slot(config, tool_name):
+            if session is not None:
+                return await asyncio.wait_for(session.call_tool(tool_name, arguments), timeout=timeout)
+            if self._uses_session(config):
+                return await self._pooled_session(config).call_tool(tool_name, arguments, timeout=timeout)
+            return await asyncio.wait_for(self._call_once(config, tool_name, arguments), timeout=timeout)
+
+    async def _call_once(self, config: dict, tool_name: str, arguments: dict) -> Any:
+        """Unpooled call: a fresh server process for this call only."""
+        params = _server_params(config)
+        spawn = tracer.begin("mcp.spawn", server=config["script"])
+        try:
+            async with stdio_client(params) as (read, write):
+                tracer.end(spawn)
+                async with ClientSession(read, write) as session:
+                    with tracer.span("mcp.initialize", server=config["script"]):
+                        await session.initialize()
+                    with tracer.span("mcp.call", tool=tool_name):
+                        return await session.call_tool(tool_name, arguments)
+        except Exception:
+            # Tearing down a cancelled call's process can fail (BrokenResourceError); report the
+            # cancellation so a deadline stays a timeout and a losing hedge just ends cancelled
+            if asyncio.current_task().cancelling():
+                raise asyncio.CancelledError
+            raise
+
+    async def _hedged_call(self, config: dict, tool_name: str, arguments: dict, hedge_after: float, timeout: float) -> Any:
+        primary = asyncio.create_task(self._dispatch(config, tool_name, arguments, timeout))
+        tasks = [primary]
+        try:
+            done, _ = await asyncio.wait(tasks, timeout=hedge_after)
+            if done:
+                return primary.result()
+
+            print(f"[mcp] {tool_name} slower than {hedge_after}s, sending hedged request")
+            tasks.append(asyncio.create_task(self._dispatch(config, tool_name, arguments, timeout)))
+            pending = set(tasks)
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        return task.result()
+            return primary.result()  # both failed → surface the primary error
+        finally:
+            for task in tasks:
+                if not task.done():
+                    task.cancel()
+
+    async def call_tools(self, calls: List[Tuple[str, dict]]) -> List[Any]:
+        """
+        Run several independent tool calls at once: call_tools([(name, args), ...]).
+        Calls are grouped by server and each group shares one session (the
+        server's pool when pooled); each call still goes through call_tool()
+        for caching, hedging and health. Results come back in input order; a
+        failed call yields its exception in its slot instead of raising.
+        """
+        results: List[Any] = [None] * len(calls)
+        groups: Dict[str, List[int]] = {}
+        for i, (tool_name, _) in enumerate(calls):
+            entry = self.tool_map.get(tool_name)
+            if not entry:
+                results[i] = ValueError(f"Tool '{tool_name}' not found on any server.")
+                continue
+            groups.setdefault(self._server_id(entry["config"]), []).append(i)
+
+        async def run_group(indices: List[int]):
+            config = self.tool_map[calls[indices[0]][0]]["config"]
+            outcomes = await self._call_group(config, [calls[i] for i in indices])
+            for i, outcome in zip(indices, outcomes):
+                results[i] = outcome
+
+        await asyncio.gather(*(run_group(indices) for indices in groups.values()))
+        return results
+
+    async def _call_group(self, config: dict, calls: List[Tuple[str, dict]]) -> List[Any]:
+        if self._uses_session(config):
+            return await asyncio.gather(
+                *(self.call_tool(tool_name, arguments) for tool_name, arguments in calls),
+                return_exceptions=True
+            )
+
+        try:
+            async with stdio_client(_server_params(config)) as (read, write):
+                async with ClientSession(read, write) as session:
+                    await session.initialize()
+                    return await asyncio.gather(
+                        *(self.call_tool(tool_name, arguments, session=session) for tool_name, arguments in calls),
+                        return_exceptions=True
+                    )
+        except Exception as e:
+            return [e] * len(calls)
 
     async def list_all_tools(self) -> List[str]:
         return list(self.tool_map.keys())
 
     def get_all_tools(self) -> List[Any]:
-        return [entry["tool"] for entry in self.tool_map.values()]
+        """Tools the planner may use; tools on servers with an open circuit are hidden."""
+        return [
+            entry["tool"] for entry in self.tool_map.values()
+            if self.health[self._server_id(entry["config"])].available
+        ]
+
+    def server_health(self) -> Dict[str, Dict[str, Any]]:
+        return {server_id: health.to_dict() for server_id, health in self.health.items()}
 
     async def shutdown(self):
-        pass  # no persistent sessions to close
\ No newline at end of file
+        if self._reaper is not None:
+            self._reaper.cancel()
+            self._reaper = None
+        for probe in self._probes.values():
+            probe.cancel()
+        self._probes.clear()
+        for session in self.sessions.values():
+            await session.stop()
+        self.sessions.clear()
@@ -23,12 +23,18 @@
 
 # core/strategy.py
 
+import asyncio
 from modules.perception import PerceptionResult
 from modules.memory import MemoryItem
-from modules.tools import summarize_tools, filter_tools_by_hint
+from modules.tools import filter_tools_by_hint
+from modules.prompt_budget import PromptBudget, summarize_tools_within
 from modules.decision import generate_plan
+from modules.action import parse_function_call
 from core.context import AgentContext
-from typing import Any
+from typing import Any, Awaitable, Callable, List, Optional
+
+# Runs a FUNCTION_CALL plan and returns the tool response (AgentLoop.prefetch)
+PlanRunner = Callable[[str], Awaitable[Any]]
 
 
 async def decide_next_action(
@@ -37,6 +43,8 @@ async def decide_next_action(
     memory_items: list[MemoryItem],
     all_tools: list[Any],
     last_result: str = "",
+    run_plan: Optional[PlanRunner] = None,
+    is_idempotent: Optional[Callable[[str], bool]] = None,
 ) -> str:
     """
     Decides what to do next using the planning strategy defined in agent profile.
@@ -47,10 +55,16 @@ async def decide_next_action(
     step = context.step + 1
     max_steps = context.agent_profile.max_steps
     tool_hint = perception.tool_hint
+    budget = context.agent_profile.prompt_budget
 
     # Step 1: Try hint-based filtered tools first
     filtered_tools = filter_tools_by_hint(all_tools, hint=tool_hint)
-    filtered_summary = summarize_tools(filtered_tools)
+    filtered_summary = summarize_tools_within(filtered_tools, perception.user_input, budget.tools)
+
+    if strategy == "explore_all":
+        return await explore_all(
+            perception, memory_items, filtered_tools, all_tools, step, max_steps, run_plan, budget, is_idempotent
+        )
 
     plan = await generate_plan(
         perception=perception,
@@ -58,6 +72,7 @@ async def decide_next_action(
         tool_descriptions=filtered_summary,
         step_num=step,
         max_steps=max_steps,
+        budget=budget,
     )
 
     # Strategy enforcement
@@ -66,14 +81,109 @@ async def decide_next_action(
 
     if strategy == "retry_once" and "unknown" in plan.lower():
         # Retry with all tools if hint-based filtering failed
-        full_summary = summarize_tools(all_tools)
-        return generate_plan(
+        full_summary = summarize_tools_within(all_tools, perception.user_input, budget.tools)
+        return await generate_plan(
             perception=perception,
             memory_items=memory_items,
             tool_descriptions=full_summary,
             step_num=step,
             max_steps=max_steps,
+            budget=budget,
         )
 
-    # Placeholder for future "explore_all" parallel planner
     return plan
+
+
+def is_usable_result(response: Any) -> bool:
+    """A tool response worth stopping the exploration for: no error and some content."""
+    if getattr(response, "isError", False):
+        return False
+    content = getattr(response, "content", None)
+    if not content:
+        return False
+    text = " ".join(getattr(item, "text", "") for item in content).strip()
+    return bool(text) and text not in ("[]", "{}", "null") and not text.startswith("ERROR")
+
+
+def _raceable(plan: str, is_idempotent: Callable[[str], bool]) -> bool:
+    try:
+        tool_name, _ = parse_function_call(plan)
+    except ValueError:
+        return False
+    return is_idempotent(tool_name)
+
+
+async def explore_all(
+    perception: PerceptionResult,
+    memory_items: List[MemoryItem],
+    filtered_tools: List[Any],
+    all_tools: List[Any],
+    step: int,
+    max_steps: int,
+    run_plan: Optional[PlanRunner] = None,
+    budget: Optional[PromptBudget] = None,
+    is_idempotent: Optional[Callable[[str], bool]] = None,
+) -> str:
+    """
+    Plan with the hint-filtered tools and with all tools at the same time, then
+    run the distinct FUNCTION_CALLs in parallel and keep the plan whose result
+    comes back usable first. Wall-clock cost is one planning round plus the
+    slowest tool call at worst, instead of one retry after another.
+
+    A losing branch's call still runs to completion on its server, so calls
+    are only raced when every candidate's tool passes is_idempotent (without
+    it, nothing is raced and the first candidate is returned).
+    """
+    budget = budget or PromptBudget()
+    tool_sets = [filtered_tools]
+    if len(filtered_tools) != len(all_tools):
+        tool_sets.append(all_tools)
+
+    candidates = await asyncio.gather(*(
+        generate_plan(
+            perception=perception,
+            memory_items=memory_items,
+            tool_descriptions=summarize_tools_within(tools, perception.user_input, budget.tools),
+            step_num=step,
+            max_steps=max_steps,
+            budget=budget,
+        )
+        for tools in tool_sets
+    ))
+    print(f"[strategy] explore_all candidates: {candidates}")
+
+    answers = [plan for plan in candidates if plan.startswith("FINAL_ANSWER:") and "unknown" not in plan.lower()]
+    if candidates[0] in answers:
+        return candidates[0]
+
+    calls = list(dict.fromkeys(plan for plan in candidates if plan.startswith("FUNCTION_CALL:")))
+    if not calls:
+        return answers[0] if answers else candidates[0]
+    # Multi-call plans already run their calls in parallel in the loop; only race single calls
+    if len(calls) == 1 or run_plan is None or any("\n" in plan for plan in calls):
+        return calls[0]
+    if is_idempotent is None or not all(_raceable(plan, is_idempotent) for plan in calls):
+        print("[strategy] explore_all: not racing calls to tools with side effects")
+        return calls[0]
+
+    async def branch(plan: str):
+        return plan, await run_plan(plan)
+
+    # Race the distinct calls; AgentLoop reuses the winner's prefetched response
+    tasks = [asyncio.create_task(branch(plan)) for plan in calls]
+    try:
+        for finished in asyncio.as_completed(tasks):
+            try:
+                plan, response = await finished
+            except Exception as e:
+                print(f"[strategy] explore_all branch failed: {e}")
+                continue
+            if is_usable_result(response):
+                print(f"[strategy] explore_all picked: {plan}")
+                return plan
+    finally:
+        for task in tasks:
+            task.cancel()
+
+    # Nothing usable: let the loop report the first candidate's outcome
+    return calls[0]
@@ -0,0 +1,147 @@
+# core/tracing.py → Stage-level tracing
+# Role: Records timed spans for each stage of an agent run and exports them as
+# JSONL (one span per line, written as they finish) and as a Chrome trace-event
+# file (open in chrome://tracing or https://ui.perfetto.dev) on close().
+
+# Off unless AGENT_TRACE=1. When off, span()/track() return one shared no-op
+# context manager and begin() returns None, so instrumented code pays a single
+# attribute check. Each agent session gets its own track (a "thread" row in the
+# trace viewer), carried through asyncio tasks by a context variable.
+
+import os
+import json
+import time
+import threading
+import contextvars
+from contextlib import contextmanager, nullcontext
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+ROOT = Path(__file__).parent.parent
+
+_NOOP = nullcontext()
+_track: contextvars.ContextVar = contextvars.ContextVar("trace_track", default="main")
+
+# (name, start, attrs, track) handed out by begin() for spans that can't be a `with` block
+SpanToken = Tuple[str, float, Dict[str, Any], str]
+
+
+class Tracer:
+    def __init__(self, enabled: bool = False, out_dir: Path = ROOT / "traces", max_events: int = 200_000):
+        self.enabled = enabled
+        self.out_dir = Path(out_dir)
+        self.max_events = max_events  # beyond this, spans only go to the JSONL file
+        self.events: List[Dict[str, Any]] = []
+        self._tracks: Dict[str, int] = {}
+        self._lock = threading.Lock()
+        self._epoch = time.perf_counter()
+        self._jsonl = None
+        self.base_name = f"trace-{datetime.now():%Y%m%d-%H%M%S}-{os.getpid()}"
+        if enabled:
+            self.out_dir.mkdir(parents=True, exist_ok=True)
+            self._jsonl = open(self.out_dir / f"{self.base_name}.jsonl", "a", encoding="utf-8")
+            print(f"[trace] Writing spans to {self.out_dir / self.base_name}.jsonl")
+
+    @classmethod
+    def from_env(cls) -> "Tracer":
+        enabled = os.getenv("AGENT_TRACE", "").lower() in ("1", "true", "yes")
+        return cls(enabled=enabled, out_dir=Path(os.getenv("AGENT_TRACE_DIR", ROOT / "traces")))
+
+    def span(self, name: str, **attrs):
+        """Time a block as one span; an escaping exception is recorded in its args."""
+        if not self.enabled:
+            return _NOOP
+        return self._span(name, attrs)
+
+    @contextmanager
+    def _span(self, name: str, attrs: Dict[str, Any]):
+        start = time.perf_counter()
+        try:
+            yield
+        except BaseException as e:
+            attrs["error"] = type(e).__name__
+            raise
+        finally:
+            self._record(name, start, time.perf_counter(), attrs, _track.get())
+
+    def begin(self, name: str, **attrs) -> Optional[SpanToken]:
+        if not self.enabled:
+            return None
+        return name, time.perf_counter(), attrs, _track.get()
+
+    def end(self, token: Optional[SpanToken]):
+        if token is not None:
+            name, start, attrs, track = token
+            self._record(name, start, time.perf_counter(), attrs, track)
+
+    def track(self, name: str):
+        """Put spans recorded inside this block (and tasks started from it) on their own track."""
+        if not self.enabled:
+            return _NOOP
+        return self._track_block(name)
+
+    @contextmanager
+    def _track_block(self, name: str):
+        token = _track.set(name)
+        try:
+            yield
+        finally:
+            _track.reset(token)
+
+    def _record(self, name: str, start: float, end: float, attrs: Dict[str, Any], track: str):
+        event = {
+            "name": name,
+            "track": track,
+            "ts": round((start - self._epoch) * 1e6, 1),
+            "dur": round((end - start) * 1e6, 1),
+            "args": attrs,
+        }
+        with self._lock:
+            self._tracks.setdefault(track, len(self._tracks) + 1)
+            if len(self.events) < self.max_events:
+                self.events.append(event)
+            if self._jsonl:
+                self._jsonl.write(json.dumps(event, default=str) + "\n")
+
+    def chrome_trace(self) -> Dict[str, Any]:
+        pid = os.getpid()
+        with self._lock:
+            events = list(self.events)
+            tracks = dict(self._tracks)
+        trace_events = [
+            {"name": "thread_name", "ph": "M", "pid": pid, "tid": tid, "args": {"name": track}}
+            for track, tid in tracks.items()
+        ]
+        trace_events += [
+            {
+                "name": e["name"],
+                "cat": e["name"].split(":", 1)[0].split(".", 1)[0],
+                "ph": "X",
+                "ts": e["ts"],
+                "dur": e["dur"],
+                "pid": pid,
+                "tid": tracks[e["track"]],
+                "args": e["args"],
+            }
+            for e in events
+        ]
+        return {"traceEvents": trace_events, "displayTimeUnit": "ms"}
+
+    def close(self) -> Optional[Path]:
+        """Flush the JSONL file and write the Chrome trace for everything recorded so far."""
+        if not self.enabled:
+            return None
+        path = self.out_dir / f"{self.base_name}.json"
+        path.write_text(json.dumps(self.chrome_trace(), default=str))
+        with self._lock:
+            if self._jsonl:
+                self._jsonl.close()
+                self._jsonl = None
+        self.enabled = False
+        print(f"[trace] Chrome trace written to {path}")
+        return path
+
+
+# Process-wide tracer (AGENT_TRACE=1 to enable, AGENT_TRACE_DIR for the output folder)
+tracer = Tracer.from_env()
@@ -13,16 +13,23 @@ from pathlib import Path
 import requests
 from markitdown import MarkItDown
 import time
-from models import AddInput, AddOutput, SqrtInput, SqrtOutput, StringsToIntsInput, StringsToIntsOutput, ExpSumInput, ExpSumOutput, PythonCodeInput, PythonCodeOutput, UrlInput, FilePathInput, MarkdownInput, MarkdownOutput, ChunkListOutput
+from models import AddInput, AddOutput, SqrtInput, SqrtOutput, StringsToIntsInput, StringsToIntsOutput, ExpSumInput, ExpSumOutput, PythonCodeInput, PythonCodeOutput, UrlInput, FilePathInput, MarkdownInput, MarkdownOutput, ChunkListOutput, IndexDocumentOutput
 from tqdm import tqdm
 import hashlib
 from pydantic import BaseModel
 import subprocess
+import threading
 import sqlite3
 import trafilatura
 import pymupdf4llm
 import re
 import base64 # ollama needs base64-encoded-image
+from contextlib import contextmanager
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
 
 
 mcp = FastMCP("Calculator")
@@ -101,8 +108,10 @@ def search_documents(query: str) -> list[str]:
     ensure_faiss_ready()
     mcp_log("SEARCH", f"Query: {query}")
     try:
-        index = faiss.read_index(str(ROOT / "faiss_index" / "index.bin"))
-        metadata = json.loads((ROOT / "faiss_index" / "metadata.json").read_text())
+        # Shared lock: never read metadata.json from one save and index.bin from another
+        with index_lock(shared=True):
+            index = faiss.read_index(str(INDEX_FILE))
+            metadata = json.loads(METADATA_FILE.read_text())
         query_vec = get_embedding(query).reshape(1, -1)
         D, I = index.search(query_vec, k=5)
         results = []
@@ -301,89 +310,195 @@ Keep markdown formatting intact.
 
 
 
-def process_documents():
-    """Process documents and create FAISS index using unified multimodal strategy."""
-    mcp_log("INFO", "Indexing documents with unified RAG pipeline...")
-    ROOT = Path(__file__).parent.resolve()
-    DOC_PATH = ROOT / "documents"
-    INDEX_CACHE = ROOT / "faiss_index"
+DOC_PATH = ROOT / "documents"
+INDEX_CACHE = ROOT / "faiss_index"
+INDEX_FILE = INDEX_CACHE / "index.bin"
+METADATA_FILE = INDEX_CACHE / "metadata.json"
+CACHE_FILE = INDEX_CACHE / "doc_index_cache.json"
+LOCK_FILE = INDEX_CACHE / ".lock"
+
+
+@contextmanager
+def index_lock(shared: bool = False):
+    """
+    Cross-process lock on the index files, which every documents replica shares.
+    Writers hold it exclusively from load to save so no one's chunks are dropped;
+    readers hold it shared. On Windows (msvcrt) it is always exclusive.
+    """
     INDEX_CACHE.mkdir(exist_ok=True)
-    INDEX_FILE = INDEX_CACHE / "index.bin"
-    METADATA_FILE = INDEX_CACHE / "metadata.json"
-    CACHE_FILE = INDEX_CACHE / "doc_index_cache.json"
+    with open(LOCK_FILE, "a+b") as handle:
+        if fcntl:
+            fcntl.flock(handle, fcntl.LOCK_SH if shared else fcntl.LOCK_EX)
+        else:
+            handle.seek(0)
+            while True:
+                try:
+                    msvcrt.locking(handle.fileno(), msvcrt.LK_NBLCK, 1)
+                    break
+                except OSError:
+                    time.sleep(0.05)
+        try:
+            yield
+        finally:
+            if fcntl:
+                fcntl.flock(handle, fcntl.LOCK_UN)
+            else:
+                handle.seek(0)
+                msvcrt.locking(handle.fileno(), msvcrt.LK_UNLCK, 1)
+
+
+def file_hash(path):
+    return hashlib.md5(Path(path).read_bytes()).hexdigest()
 
-    def file_hash(path):
-        return hashlib.md5(Path(path).read_bytes()).hexdigest()
 
-    CACHE_META = json.loads(CACHE_FILE.read_text()) if CACHE_FILE.exists() else {}
+def load_index_state():
+    """Returns (cache_meta, metadata, index) as last saved; index is None if there isn't one yet. Call under index_lock()."""
+    cache_meta = json.loads(CACHE_FILE.read_text()) if CACHE_FILE.exists() else {}
     metadata = json.loads(METADATA_FILE.read_text()) if METADATA_FILE.exists() else []
     index = faiss.read_index(str(INDEX_FILE)) if INDEX_FILE.exists() else None
+    return cache_meta, metadata, index
+
+
+def save_index_state(cache_meta, metadata, index):
+    """Write via temp files + rename, under index_lock() so readers see all three files from the same save."""
+    def replace_with(path: Path, write):
+        tmp = path.with_name(path.name + ".tmp")
+        write(tmp)
+        os.replace(tmp, path)
+
+    replace_with(CACHE_FILE, lambda tmp: tmp.write_text(json.dumps(cache_meta, indent=2)))
+    replace_with(METADATA_FILE, lambda tmp: tmp.write_text(json.dumps(metadata, indent=2)))
+    replace_with(INDEX_FILE, lambda tmp: faiss.write_index(index, str(tmp)))
+
+
+def extract_markdown(file: Path) -> str:
+    ext = file.suffix.lower()
+
+    if ext == ".pdf":
+        mcp_log("INFO", f"Using MuPDF4LLM to extract {file.name}")
+        return extract_pdf(FilePathInput(file_path=str(file))).markdown
 
+    elif ext in [".html", ".htm", ".url"]:
+        mcp_log("INFO", f"Using Trafilatura to extract {file.name}")
+        return extract_webpage(UrlInput(url=file.read_text().strip())).markdown
+
+    else:
+        # Fallback to MarkItDown for other formats
+        converter = MarkItDown()
+        mcp_log("INFO", f"Using MarkItDown fallback for {file.name}")
+        return converter.convert(str(file)).text_content
+
+
+def indexed_chunks(name: str, fhash: str):
+    """Chunk count if this version of the file is already indexed, else None."""
+    with index_lock(shared=True):
+        cache_meta = json.loads(CACHE_FILE.read_text()) if CACHE_FILE.exists() else {}
+        if cache_meta.get(name) != fhash:
+            return None
+        metadata = json.loads(METADATA_FILE.read_text()) if METADATA_FILE.exists() else []
+    return sum(1 for item in metadata if item["doc"] == name)
+
+
+def index_file(file: Path, fhash: str) -> int:
+    """
+    Extract, chunk and embed a single file into the index, replacing chunks
+    from an earlier version of the same file. Returns the number of chunks added.
+
+    The slow part (extraction, embedding) runs unlocked; the index is reloaded
+    and saved under the exclusive lock, so changes saved meanwhile by another
+    replica are kept.
+    """
+    markdown = extract_markdown(file)
+
+    if not markdown.strip():
+        mcp_log("WARN", f"No content extracted from {file.name}")
+        return 0
+
+    if len(markdown.split()) < 10:
+        mcp_log("WARN", f"Content too short for semantic merge in {file.name} → Skipping chunking.")
+        chunks = [markdown.strip()]
+    else:
+        mcp_log("INFO", f"Running semantic merge on {file.name} with {len(markdown.split())} words")
+        chunks = semantic_merge(markdown)
+
+    embeddings_for_file = []
+    new_metadata = []
+    for i, chunk in enumerate(tqdm(chunks, desc=f"Embedding {file.name}")):
+        embedding = get_embedding(chunk)
+        embeddings_for_file.append(embedding)
+        new_metadata.append({
+            "doc": file.name,
+            "chunk": chunk,
+            "chunk_id": f"{file.stem}_{i}"
+        })
+
+    if not embeddings_for_file:
+        return 0
+
+    with index_lock():
+        cache_meta, metadata, index = load_index_state()
+        index, metadata = replace_chunks(file.name, embeddings_for_file, new_metadata, metadata, index)
+        cache_meta[file.name] = fhash
+        save_index_state(cache_meta, metadata, index)
+    mcp_log("SAVE", f"Saved FAISS index and metadata after processing {file.name}")
+    return len(new_metadata)
+
+
+def replace_chunks(name: str, embeddings, new_metadata, metadata, index):
+    """Swap a document's chunks in (index, metadata) for new ones. Returns (index, metadata)."""
+    # Drop the previous version's chunks (IndexFlat keeps the order of the remaining ids)
+    stale = [i for i, item in enumerate(metadata) if item["doc"] == name]
+    if stale and index is not None:
+        index.remove_ids(np.array(stale, dtype=np.int64))
+        metadata = [item for item in metadata if item["doc"] != name]
+        mcp_log("INFO", f"Replaced {len(stale)} old chunks of {name}")
+
+    if index is None:
+        dim = len(embeddings[0])
+        index = faiss.IndexFlatL2(dim)
+    index.add(np.stack(embeddings))
+    metadata.extend(new_metadata)
+    return index, metadata
+
+
+def process_documents():
+    """Process documents and create FAISS index using unified multimodal strategy."""
+    mcp_log("INFO", "Indexing documents with unified RAG pipeline...")
     for file in DOC_PATH.glob("*.*"):
+        # Skip folders and in-progress uploads (.name.part)
+        if not file.is_file() or file.name.startswith("."):
+            continue
+
         fhash = file_hash(file)
-        if file.name in CACHE_META and CACHE_META[file.name] == fhash:
+        if indexed_chunks(file.name, fhash) is not None:
             mcp_log("SKIP", f"Skipping unchanged file: {file.name}")
             continue
 
         mcp_log("PROC", f"Processing: {file.name}")
         try:
-            ext = file.suffix.lower()
-            markdown = ""
-
-            if ext == ".pdf":
-                mcp_log("INFO", f"Using MuPDF4LLM to extract {file.name}")
-                markdown = extract_pdf(FilePathInput(file_path=str(file))).markdown
+            # ✅ Each file is saved as soon as it's indexed
+            index_file(file, fhash)
+        except Exception as e:
+            mcp_log("ERROR", f"Failed to process {file.name}: {e}")
 
-            elif ext in [".html", ".htm", ".url"]:
-                mcp_log("INFO", f"Using Trafilatura to extract {file.name}")
-                markdown = extract_webpage(UrlInput(url=file.read_text().strip())).markdown
 
-            else:
-                # Fallback to MarkItDown for other formats
-                converter = MarkItDown()
-                mcp_log("INFO", f"Using MarkItDown fallback for {file.name}")
-                markdown = converter.convert(str(file)).text_content
-
-            if not markdown.strip():
-                mcp_log("WARN", f"No content extracted from {file.name}")
-                continue
-
-            if len(markdown.split()) < 10:
-                mcp_log("WARN", f"Content too short for semantic merge in {file.name} → Skipping chunking.")
-                chunks = [markdown.strip()]
-            else:
-                mcp_log("INFO", f"Running semantic merge on {file.name} with {len(markdown.split())} words")
-                chunks = semantic_merge(markdown)
-
-
-            embeddings_for_file = []
-            new_metadata = []
-            for i, chunk in enumerate(tqdm(chunks, desc=f"Embedding {file.name}")):
-                embedding = get_embedding(chunk)
-                embeddings_for_file.append(embedding)
-                new_metadata.append({
-                    "doc": file.name,
-                    "chunk": chunk,
-                    "chunk_id": f"{file.stem}_{i}"
-                })
-
-            if embeddings_for_file:
-                if index is None:
-                    dim = len(embeddings_for_file[0])
-                    index = faiss.IndexFlatL2(dim)
-                index.add(np.stack(embeddings_for_file))
-                metadata.extend(new_metadata)
-                CACHE_META[file.name] = fhash
-
-                # ✅ Immediately save index and metadata
-                CACHE_FILE.write_text(json.dumps(CACHE_META, indent=2))
-                METADATA_FILE.write_text(json.dumps(metadata, indent=2))
-                faiss.write_index(index, str(INDEX_FILE))
-                mcp_log("SAVE", f"Saved FAISS index and metadata after processing {file.name}")
+@mcp.tool()
+def index_document(input: FilePathInput) -> IndexDocumentOutput:
+    """Index one file from the documents folder so search_documents can find it. Usage: index_document|input={"file_path": "report.pdf"}"""
+    file = (DOC_PATH / input.file_path).resolve()
+    if file.parent != DOC_PATH or not file.is_file():
+        raise ValueError(f"Not a file in documents/: {input.file_path}")
 
-        except Exception as e:
-            mcp_log("ERROR", f"Failed to process {file.name}: {e}")
+    fhash = file_hash(file)
+    chunks = indexed_chunks(file.name, fhash)
+    if chunks is not None:
+        return IndexDocumentOutput(doc=file.name, chunks=chunks, status="unchanged")
 
+    mcp_log("PROC", f"Indexing upload: {file.name}")
+    added = index_file(file, fhash)
+    if not added:
+        return IndexDocumentOutput(doc=file.name, chunks=0, status="empty")
+    return IndexDocumentOutput(doc=file.name, chunks=added, status="indexed")
 
 
 def ensure_faiss_ready():
@@ -404,7 +519,6 @@ if __name__ == "__main__":
         mcp.run() # Run without transport for dev server
     else:
         # Start the server in a separate thread
-        import threading
         server_thread = threading.Thread(target=lambda: mcp.run(transport="stdio"))
         server_thread.daemon = True
         server_thread.start()
@@ -412,8 +526,9 @@ if __name__ == "__main__":
         # Wait a moment for the server to start
         time.sleep(2)
         
-        # Process documents after server is running
-        process_documents()
+        # Process documents after server is running (extra replicas share the index)
+        if os.getenv("MCP_REPLICA_INDEX", "0") == "0":
+            process_documents()
         
         # Keep the main thread alive
         try:
@@ -49,6 +49,11 @@ class MarkdownOutput(BaseModel):
 class ChunkListOutput(BaseModel):
     chunks: List[str]
 
+class IndexDocumentOutput(BaseModel):
+    doc: str
+    chunks: int
+    status: str  # indexed | unchanged | empty
+
 class ShellCommandInput(BaseModel):
     command: str
 
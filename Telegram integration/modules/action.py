@@ -1,8 +1,9 @@
 # modules/action.py
 
-from typing import Dict, Any, Union
+from typing import Dict, Any, List, Tuple, Union
 from pydantic import BaseModel
 import ast
+import json
 
 # Optional logging fallback
 try:
@@ -21,6 +22,28 @@ class ToolCallResult(BaseModel):
     raw_response: Any
 
 
+def tool_result_text(response: Any) -> str:
+    """
+    Text of an MCP tool response for prompts and memory. A list result arrives
+    as one TextContent per item; a structured result whose JSON carries a
+    `markdown` field (extract_pdf, extract_webpage) is
+    unwrapped to that field, anything else is returned as its raw text.
+    """
+    content = response.content
+    if isinstance(content, list) and content and all(hasattr(item, "text") for item in content):
+        raw = "\n\n".join(item.text for item in content)
+    else:
+        raw = getattr(content, 'text', str(content))
+    try:
+        result_obj = json.loads(raw) if raw.strip().startswith("{") else raw
+    except json.JSONDecodeError:
+        result_obj = raw
+
+    if isinstance(result_obj, dict) and isinstance(result_obj.get("markdown"), str):
+        return result_obj["markdown"]
+    return raw
+
+
 def parse_function_call(response: str) -> tuple[str, Dict[str, Any]]:
     """
     Parses a FUNCTION_CALL string like:
@@ -60,3 +83,14 @@ def parse_function_call(response: str) -> tuple[str, Dict[str, Any]]:
     except Exception as e:
         log("parser", f"❌ Parse failed: {e}")
         raise
+
+
+def parse_function_calls(plan: str) -> List[Tuple[str, Dict[str, Any]]]:
+    """
+    Parses every FUNCTION_CALL line of a plan. Several lines mean independent
+    calls the planner wants run in parallel.
+    """
+    lines = [line.strip() for line in plan.splitlines() if line.strip().startswith("FUNCTION_CALL:")]
+    if not lines:
+        raise ValueError("Invalid function call format.")
+    return [parse_function_call(line) for line in lines]
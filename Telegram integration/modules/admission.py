@@ -0,0 +1,140 @@
+# modules/admission.py
+
+import time
+import logging
+from typing import Dict, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+class TokenBucket:
+    """
+    Classic token bucket: refills at `rate` tokens per second up to `burst`.
+    A rate of 0 means unlimited.
+    """
+
+    def __init__(self, rate: float, burst: float):
+        self.rate = rate
+        self.burst = max(burst, 1.0)
+        self.tokens = self.burst
+        self.updated = time.monotonic()
+
+    def _refill(self, now: float):
+        if now <= self.updated:  # `now` read before this bucket was created
+            return
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self, now: float) -> float:
+        """Seconds until one token is available (0 if one is available now)."""
+        if self.rate <= 0:
+            return 0.0
+        self._refill(now)
+        return 0.0 if self.tokens >= 1 else (1 - self.tokens) / self.rate
+
+    def take(self):
+        if self.rate > 0:
+            self.tokens -= 1
+
+    def full(self, now: float) -> bool:
+        self._refill(now)
+        return self.tokens >= self.burst
+
+
+class Decision:
+    def __init__(self, admitted: bool, scope: Optional[str] = None, retry_after: float = 0.0, notify: bool = False):
+        self.admitted = admitted
+        self.scope = scope  # "user" | "chat" | "global" when rejected
+        self.retry_after = retry_after
+        self.notify = notify  # first rejection of this user in this chat until retry_after has passed
+
+
+class AdmissionControl:
+    """
+    Per-user, per-chat and global token buckets checked before a message is
+    queued. A message is admitted only if all three have a token; tokens are
+    taken from all three together, so a rejection never burns a user's quota.
+    Only the first rejection of a user in a chat per wait window asks for a
+    notice (Decision.notify), so a flood isn't answered message for message.
+
+    Rates are given per minute; 0 disables that level.
+    """
+
+    def __init__(
+        self,
+        user_per_minute: float = 6,
+        user_burst: float = 3,
+        chat_per_minute: float = 10,
+        chat_burst: float = 5,
+        global_per_minute: float = 30,
+        global_burst: float = 10,
+    ):
+        self.user_limits = (user_per_minute / 60.0, user_burst)
+        self.chat_limits = (chat_per_minute / 60.0, chat_burst)
+        self.global_bucket = TokenBucket(global_per_minute / 60.0, global_burst)
+        self._users: Dict[int, TokenBucket] = {}
+        self._chats: Dict[int, TokenBucket] = {}
+        self._notified: Dict[Tuple[int, int], float] = {}  # (user, chat) → no new notice before this time
+        self.admitted = 0
+        self.rejected = {"user": 0, "chat": 0, "global": 0}
+
+    @classmethod
+    def from_config(cls, section: Optional[dict], env: Dict[str, str]) -> "AdmissionControl":
+        """Build from the profile's `admission:` section; ADMISSION_* env vars take precedence."""
+        section = section or {}
+        kwargs = {}
+        for key in ("user_per_minute", "user_burst", "chat_per_minute", "chat_burst",
+                    "global_per_minute", "global_burst"):
+            value = env.get(f"ADMISSION_{key.upper()}", section.get(key))
+            if value is not None:
+                kwargs[key] = float(value)
+        return cls(**kwargs)
+
+    def _bucket(self, buckets: Dict[int, TokenBucket], key: int, limits: Tuple[float, float]) -> TokenBucket:
+        bucket = buckets.get(key)
+        if bucket is None:
+            bucket = buckets[key] = TokenBucket(*limits)
+        return bucket
+
+    def admit(self, user_id: int, chat_id: int) -> Decision:
+        now = time.monotonic()
+        checks = [
+            ("user", self._bucket(self._users, user_id, self.user_limits)),
+            ("chat", self._bucket(self._chats, chat_id, self.chat_limits)),
+            ("global", self.global_bucket),
+        ]
+        for scope, bucket in checks:
+            wait = bucket.wait_time(now)
+            if wait > 0:
+                self.rejected[scope] += 1
+                logger.info(f"Rejected message from user {user_id} in chat {chat_id}: {scope} limit")
+                notify = self._notified.get((user_id, chat_id), 0.0) <= now
+                if notify:
+                    self._notified[(user_id, chat_id)] = now + wait
+                return Decision(False, scope, wait, notify)
+
+        for _, bucket in checks:
+            bucket.take()
+        self.admitted += 1
+        self._notified.pop((user_id, chat_id), None)
+        if len(self._users) + len(self._chats) + len(self._notified) > 1000:
+            self._prune(now)
+        return Decision(True)
+
+    def _prune(self, now: float):
+        """Forget buckets that have refilled completely; they'd be recreated identical."""
+        for buckets in (self._users, self._chats):
+            for key in [k for k, b in buckets.items() if b.full(now)]:
+                del buckets[key]
+        for key in [k for k, until in self._notified.items() if until <= now]:
+            del self._notified[key]
+
+    def stats(self) -> dict:
+        return {
+            "admitted": self.admitted,
+            "rejected_user": self.rejected["user"],
+            "rejected_chat": self.rejected["chat"],
+            "rejected_global": self.rejected["global"],
+            "tracked_users": len(self._users),
+            "tracked_chats": len(self._chats),
+        }
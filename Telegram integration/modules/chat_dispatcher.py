@@ -0,0 +1,158 @@
+# modules/chat_dispatcher.py
+
+import asyncio
+import time
+import logging
+from collections import deque
+from typing import Any, Awaitable, Callable, Deque, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class ChatJob:
+    def __init__(self, chat_id: int, payload: Any):
+        self.chat_id = chat_id
+        self.payload = payload
+        self.enqueued_at = time.monotonic()
+
+
+class QueueFullError(Exception):
+    """The chat already has max_queue_per_chat jobs waiting."""
+
+
+class ChatDispatcher:
+    """
+    Bounded worker pool with one FIFO queue per chat.
+
+    At most `workers` jobs run at once across all chats, and jobs from the same
+    chat run strictly one after another in arrival order. A chat with pending
+    work is scheduled round-robin with the other ready chats, so one busy chat
+    cannot starve the rest.
+    """
+
+    def __init__(
+        self,
+        handler: Callable[[ChatJob], Awaitable[None]],
+        workers: int = 2,
+        max_queue_per_chat: int = 10,
+    ):
+        self.handler = handler
+        self.workers = workers
+        self.max_queue_per_chat = max_queue_per_chat
+        self._queues: Dict[int, Deque[ChatJob]] = {}
+        self._active: set = set()  # chats with a job currently running
+        self._ready: Optional[asyncio.Queue] = None  # chat ids waiting for a worker
+        self._tasks: List[asyncio.Task] = []
+        self._running: Dict[int, ChatJob] = {}  # worker index → job it is running
+        self._idle = asyncio.Event()
+        self._idle.set()
+        self._wait_times: Deque[float] = deque(maxlen=200)
+        self.processed = 0
+        self.failed = 0
+
+    def start(self):
+        self._ready = asyncio.Queue()
+        self._tasks = [asyncio.create_task(self._worker(i)) for i in range(self.workers)]
+        logger.info(f"Chat dispatcher started with {self.workers} workers")
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    def take_pending(self) -> List[ChatJob]:
+        """Remove every queued job that has not started yet, oldest first (shutdown)."""
+        pending = sorted((job for queue in self._queues.values() for job in queue), key=lambda job: job.enqueued_at)
+        for queue in self._queues.values():
+            queue.clear()
+        return pending
+
+    async def drain(self, timeout: float) -> List[ChatJob]:
+        """
+        Shutdown: drop queued jobs, wait up to timeout seconds for the running
+        ones, then stop the workers. Returns the jobs that did not complete
+        (still queued, then cancelled mid-run); call take_pending() first to
+        deal with the queued ones before waiting.
+        """
+        unfinished = self.take_pending()
+        try:
+            await asyncio.wait_for(self._idle.wait(), timeout=timeout)
+        except asyncio.TimeoutError:
+            pass
+        unfinished.extend(self._running.values())
+        await self.stop()
+        return unfinished
+
+    def submit(self, chat_id: int, payload: Any) -> int:
+        """
+        Queue a job for a chat. Returns how many jobs are ahead of it
+        (0 = a worker picks it up right away). Raises QueueFullError when the
+        chat's queue is full.
+        """
+        queue = self._queues.setdefault(chat_id, deque())
+        if len(queue) >= self.max_queue_per_chat:
+            raise QueueFullError(f"Chat {chat_id} already has {len(queue)} pending requests")
+
+        ahead = len(queue) + (1 if chat_id in self._active else 0)
+        free_workers = self.workers - self.busy_workers
+        if ahead == 0 and self._ready.qsize() >= free_workers:
+            ahead = self._ready.qsize() - free_workers + 1  # waiting for any worker to free up
+
+        scheduled = chat_id in self._active or len(queue) > 0
+        queue.append(ChatJob(chat_id, payload))
+        if not scheduled:
+            self._ready.put_nowait(chat_id)
+        return ahead
+
+    @property
+    def busy_workers(self) -> int:
+        return len(self._active)
+
+    @property
+    def queue_depth(self) -> int:
+        return sum(len(queue) for queue in self._queues.values())
+
+    async def _worker(self, index: int):
+        while True:
+            chat_id = await self._ready.get()
+            queue = self._queues.get(chat_id)
+            if not queue:
+                continue
+
+            job = queue.popleft()
+            self._active.add(chat_id)
+            self._running[index] = job
+            self._idle.clear()
+            self._wait_times.append(time.monotonic() - job.enqueued_at)
+            try:
+                await self.handler(job)
+                self.processed += 1
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self.failed += 1
+                logger.error(f"Worker {index} failed on chat {chat_id}: {e}", exc_info=True)
+            finally:
+                self._active.discard(chat_id)
+                self._running.pop(index, None)
+                if not self._running:
+                    self._idle.set()
+                if queue:
+                    self._ready.put_nowait(chat_id)  # next job of this chat, behind other ready chats
+                else:
+                    self._queues.pop(chat_id, None)
+
+    def stats(self) -> Dict[str, Any]:
+        waits = sorted(self._wait_times)
+        return {
+            "workers": self.workers,
+            "busy_workers": self.busy_workers,
+            "queue_depth": self.queue_depth,
+            "chats_waiting": sum(1 for queue in self._queues.values() if queue),
+            "processed": self.processed,
+            "failed": self.failed,
+            "wait_avg": sum(waits) / len(waits) if waits else 0.0,
+            "wait_p95": waits[int(0.95 * (len(waits) - 1))] if waits else 0.0,
+            "wait_max": waits[-1] if waits else 0.0,
+        }
@@ -1,10 +1,13 @@
-from typing import List, Optional
+from typing import List, Optional, Tuple
 from modules.perception import PerceptionResult
 from modules.memory import MemoryItem
-from modules.model_manager import ModelManager
+from modules.model_manager import shared_model_manager
+from modules.prompt_budget import PromptBudget, budget_memory
 from dotenv import load_dotenv
 import google.generativeai as genai
 import os
+import re
+import json
 import asyncio
 
 # Optional: import logger if available
@@ -16,7 +19,40 @@ except ImportError:
         now = datetime.datetime.now().strftime("%H:%M:%S")
         print(f"[{now}] [{stage}] {msg}")
 
-model = ModelManager()
+model = shared_model_manager()
+
+# Examples and rules shared by the planning prompts
+PLAN_GUIDE = """✅ Examples:
+- FUNCTION_CALL: add|a=5|b=3
+- FUNCTION_CALL: strings_to_chars_to_int|input.string=INDIA
+- FUNCTION_CALL: int_list_to_exponential_sum|input.int_list=[73,78,68,73,65]
+- FINAL_ANSWER: [42] → Always mention final answer to the query, not that some other description.
+
+✅ Independent calls in one step (one per line, they run in parallel):
+- User asks: "ASCII values of INDIA, and how much did Anmol Singh pay for his DLF apartment?"
+  - FUNCTION_CALL: strings_to_chars_to_int|input.string=INDIA
+  - FUNCTION_CALL: search_documents|query="Anmol Singh DLF apartment payment"
+
+✅ Examples:
+- User asks: "What’s the relationship between Cricket and Sachin Tendulkar"
+  - FUNCTION_CALL: search_documents|query="relationship between Cricket and Sachin Tendulkar"
+  - [receives a detailed document]
+  - FINAL_ANSWER: [Sachin Tendulkar is widely regarded as the "God of Cricket" due to his exceptional skills, longevity, and impact on the sport in India. He is the leading run-scorer in both Test and ODI cricket, and the first to score 100 centuries in international cricket. His influence extends beyond his statistics, as he is seen as a symbol of passion, perseverance, and a national icon. ]
+
+---
+
+📏 IMPORTANT Rules:
+
+- 🚫 Do NOT invent tools. Use only the tools listed above. Tool description has useage pattern, only use that.
+- 📄 If the question may relate to public/factual knowledge (like companies, people, places), use the `search_documents` tool to look for the answer.
+- 🧮 If the question is mathematical, use the appropriate math tool.
+- 🔁 Analyze that whether you have already got a good factual result from a tool, do NOT search again — summarize and respond with FINAL_ANSWER.
+- ❌ NEVER repeat tool calls with the same parameters unless the result was empty. When searching rely on first reponse from tools, as that is the best response probably.
+- ❌ NEVER output explanation text — only structured FUNCTION_CALL or FINAL_ANSWER.
+- ✅ Use nested keys like `input.string` or `input.int_list`, and square brackets for lists.
+- 💡 If no tool fits or you're unsure, end with: FINAL_ANSWER: [unknown]
+- ⏳ You have 3 attempts. Final attempt must end with FINAL_ANSWER.
+"""
 
 
 async def generate_plan(
@@ -24,11 +60,12 @@ async def generate_plan(
     memory_items: List[MemoryItem],
     tool_descriptions: Optional[str] = None,
     step_num: int = 1,
-    max_steps: int = 3
+    max_steps: int = 3,
+    budget: Optional[PromptBudget] = None
 ) -> str:
     """Generates the next step plan for the agent: either tool usage or final answer."""
 
-    memory_texts = "\n".join(f"- {m.text}" for m in memory_items) or "None"
+    memory_texts = format_memory(memory_items, perception.user_input, budget)
     tool_context = f"\nYou have access to the following tools:\n{tool_descriptions}" if tool_descriptions else ""
 
     prompt = f"""
@@ -40,6 +77,8 @@ Respond in **exactly one line** using one of the following formats:
 - FUNCTION_CALL: tool_name|param1=value1|param2=value2
 - FINAL_ANSWER: [your final result] *(Not description, but actual final answer)
 
+Only exception: if the task needs several tool calls that do NOT depend on each other's results, write each FUNCTION_CALL on its own line; they run in parallel. Never mix FUNCTION_CALL and FINAL_ANSWER lines.
+
 🧠 Context:
 - Step: {step_num} of {max_steps}
 - Memory: 
@@ -52,32 +91,7 @@ Respond in **exactly one line** using one of the following formats:
 - Entities: {', '.join(perception.entities)}
 - Tool hint: {perception.tool_hint or 'None'}
 
-✅ Examples:
-- FUNCTION_CALL: add|a=5|b=3
-- FUNCTION_CALL: strings_to_chars_to_int|input.string=INDIA
-- FUNCTION_CALL: int_list_to_exponential_sum|input.int_list=[73,78,68,73,65]
-- FINAL_ANSWER: [42] → Always mention final answer to the query, not that some other description.
-
-✅ Examples:
-- User asks: "What’s the relationship between Cricket and Sachin Tendulkar"
-  - FUNCTION_CALL: search_documents|query="relationship between Cricket and Sachin Tendulkar"
-  - [receives a detailed document]
-  - FINAL_ANSWER: [Sachin Tendulkar is widely regarded as the "God of Cricket" due to his exceptional skills, longevity, and impact on the sport in India. He is the leading run-scorer in both Test and ODI cricket, and the first to score 100 centuries in international cricket. His influence extends beyond his statistics, as he is seen as a symbol of passion, perseverance, and a national icon. ]
-
----
-
-📏 IMPORTANT Rules:
-
-- 🚫 Do NOT invent tools. Use only the tools listed above. Tool description has useage pattern, only use that.
-- 📄 If the question may relate to public/factual knowledge (like companies, people, places), use the `search_documents` tool to look for the answer.
-- 🧮 If the question is mathematical, use the appropriate math tool.
-- 🔁 Analyze that whether you have already got a good factual result from a tool, do NOT search again — summarize and respond with FINAL_ANSWER.
-- ❌ NEVER repeat tool calls with the same parameters unless the result was empty. When searching rely on first reponse from tools, as that is the best response probably.
-- ❌ NEVER output explanation text — only structured FUNCTION_CALL or FINAL_ANSWER.
-- ✅ Use nested keys like `input.string` or `input.int_list`, and square brackets for lists.
-- 💡 If no tool fits or you're unsure, end with: FINAL_ANSWER: [unknown]
-- ⏳ You have 3 attempts. Final attempt must end with FINAL_ANSWER.
-"""
+{PLAN_GUIDE}"""
 
 
 
@@ -85,13 +99,104 @@ Respond in **exactly one line** using one of the following formats:
         raw = (await model.generate_text(prompt)).strip()
         log("plan", f"LLM output: {raw}")
 
-        for line in raw.splitlines():
-            if line.strip().startswith("FUNCTION_CALL:") or line.strip().startswith("FINAL_ANSWER:"):
-                return line.strip()
-
-        return "FINAL_ANSWER: [unknown]"
+        return extract_plan(raw) or "FINAL_ANSWER: [unknown]"
 
     except Exception as e:
         log("plan", f"⚠️ Planning failed: {e}")
         return "FINAL_ANSWER: [unknown]"
 
+
+async def generate_fused_plan(
+    user_input: str,
+    memory_items: List[MemoryItem],
+    tool_descriptions: Optional[str] = None,
+    step_num: int = 1,
+    max_steps: int = 3,
+    budget: Optional[PromptBudget] = None
+) -> Optional[Tuple[PerceptionResult, str]]:
+    """
+    Perception and planning in one LLM call. Returns (perception, plan line),
+    or None if the output can't be parsed so the caller can fall back to
+    extract_perception() + generate_plan().
+    """
+
+    memory_texts = format_memory(memory_items, user_input, budget)
+    tool_context = f"\nYou have access to the following tools:\n{tool_descriptions}" if tool_descriptions else ""
+
+    prompt = f"""
+You are a reasoning-driven AI agent with access to tools and memory.
+In a single reply, first extract structured facts from the input, then decide the next step towards the FINAL_ANSWER.
+
+Respond in **exactly two lines**:
+
+PERCEPTION: {{"intent": "brief phrase about what the user wants", "entities": ["keywords", "or values"], "tool_hint": "likely tool name or null"}}
+FUNCTION_CALL: tool_name|param1=value1|param2=value2   ← or →   FINAL_ANSWER: [your final result]
+
+The PERCEPTION line must be valid JSON on one line, with `entities` a list of strings. It is the only exception to the output rules below.
+If the task needs several tool calls that do NOT depend on each other's results, write each FUNCTION_CALL on its own line after PERCEPTION; they run in parallel.
+
+🧠 Context:
+- Step: {step_num} of {max_steps}
+- Memory: 
+{memory_texts}
+{tool_context}
+
+🎯 Input:
+"{user_input}"
+
+{PLAN_GUIDE}"""
+
+    try:
+        raw = (await model.generate_text(prompt)).strip()
+        log("plan", f"LLM fused output: {raw}")
+        return parse_fused_output(raw, user_input)
+
+    except Exception as e:
+        log("plan", f"⚠️ Fused planning failed: {e}")
+        return None
+
+
+def format_memory(memory_items: List[MemoryItem], task: str, budget: Optional[PromptBudget] = None) -> str:
+    """Memory section of the planning prompt, kept within the profile's token budget."""
+    budget = budget or PromptBudget()
+    texts = budget_memory([m.text for m in memory_items], task, budget.memory, budget.memory_item)
+    return "\n".join(f"- {text}" for text in texts) or "None"
+
+
+def extract_plan(raw: str) -> Optional[str]:
+    """
+    The plan in an LLM reply: its FINAL_ANSWER line, or all of its FUNCTION_CALL
+    lines (independent calls, one per line). Whichever kind comes first wins.
+    """
+    actions = [
+        line.strip() for line in raw.splitlines()
+        if line.strip().startswith("FUNCTION_CALL:") or line.strip().startswith("FINAL_ANSWER:")
+    ]
+    if not actions:
+        return None
+    if actions[0].startswith("FINAL_ANSWER:"):
+        return actions[0]
+    return "\n".join(dict.fromkeys(line for line in actions if line.startswith("FUNCTION_CALL:")))
+
+
+def parse_fused_output(raw: str, user_input: str) -> Optional[Tuple[PerceptionResult, str]]:
+    perception = None
+    for line in raw.splitlines():
+        line = line.strip()
+        if line.startswith("PERCEPTION:") and perception is None:
+            clean = re.sub(r"^```json|```$", "", line[len("PERCEPTION:"):].strip()).strip()
+            try:
+                parsed = json.loads(clean)
+                if isinstance(parsed.get("entities"), dict):
+                    parsed["entities"] = list(parsed["entities"].values())
+                parsed["user_input"] = user_input
+                parsed.setdefault("intent", None)
+                perception = PerceptionResult(**parsed)
+            except Exception as e:
+                log("plan", f"⚠️ Fused PERCEPTION line unparseable: {e}")
+                return None
+
+    plan = extract_plan(raw)
+    if perception is None or plan is None:
+        return None
+    return perception, plan
@@ -0,0 +1,107 @@
+# modules/delivery.py
+
+import io
+import logging
+from typing import List
+
+from telegram import InputFile, Message
+
+logger = logging.getLogger(__name__)
+
+TELEGRAM_MESSAGE_LIMIT = 4096
+FENCE = "```"
+
+# Preferred split points, best first: paragraph, line, sentence, word
+_SEPARATORS = ["\n\n", "\n", ". ", " "]
+
+
+def telegram_len(text: str) -> int:
+    """Length as Telegram counts it (UTF-16 code units; most emoji count as 2)."""
+    return len(text.encode("utf-16-le")) // 2
+
+
+def _cut_point(text: str, limit: int) -> int:
+    """Index at which to cut text so the head fits in limit, preferring markdown-friendly boundaries."""
+    # Character count is an upper bound on what fits; shrink until the UTF-16 length fits
+    window = min(len(text), limit)
+    while telegram_len(text[:window]) > limit:
+        window -= max(1, (telegram_len(text[:window]) - limit) // 2)
+
+    for sep in _SEPARATORS:
+        idx = text.rfind(sep, 0, window)
+        if idx > window // 2:  # don't produce tiny chunks just to hit a separator
+            return idx + len(sep)
+    return window
+
+
+def split_message(text: str, limit: int = TELEGRAM_MESSAGE_LIMIT) -> List[str]:
+    """
+    Split text into parts of at most `limit` characters, cutting at paragraph,
+    line, sentence or word boundaries. A ``` code block cut in two is closed at
+    the end of one part and reopened at the start of the next.
+    """
+    parts: List[str] = []
+    reopen = ""
+    rest = text
+    # Room for a closing fence and its newline
+    budget = limit - len(FENCE) - 1
+    while rest:
+        rest = reopen + rest
+        if telegram_len(rest) <= limit:
+            parts.append(rest)
+            break
+
+        cut = _cut_point(rest, budget)
+        head, rest = rest[:cut].rstrip("\n"), rest[cut:].lstrip("\n")
+
+        # Odd number of fences means we're inside a code block at the cut
+        if head.count(FENCE) % 2 == 1:
+            opening = head[head.rfind(FENCE):].split("\n", 1)[0]  # keep the language tag
+            head += "\n" + FENCE
+            reopen = opening + "\n"
+        else:
+            reopen = ""
+        parts.append(head)
+    return parts
+
+
+def part_prefix(index: int, total: int) -> str:
+    return f"({index}/{total})\n"
+
+
+async def deliver_answer(
+    message: Message,
+    text: str,
+    header: str = "✅ Result:\n\n",
+    max_parts: int = 4,
+    filename: str = "result.md",
+) -> int:
+    """
+    Put an agent answer in front of the user, replacing the "Processing..." message.
+
+    Short answers are a single edit. Longer ones are split and sent in order
+    (first part as the edit, the rest as replies). Answers needing more than
+    max_parts messages are uploaded as a document built in memory, with a preview
+    in the edited message. Returns the number of messages/documents sent.
+    """
+    full = header + text
+    if telegram_len(full) <= TELEGRAM_MESSAGE_LIMIT:
+        await message.edit_text(full)
+        return 1
+
+    # Replies after the first carry a "(i/n)" line; leave room for it in every part
+    parts = split_message(full, limit=TELEGRAM_MESSAGE_LIMIT - len(part_prefix(max_parts, max_parts)))
+    if len(parts) <= max_parts:
+        await message.edit_text(parts[0])
+        for i, part in enumerate(parts[1:], start=2):
+            await message.reply_text(part_prefix(i, len(parts)) + part)
+        return len(parts)
+
+    preview = split_message(text, limit=800)[0]
+    await message.edit_text(
+        f"{header}{preview}\n\n… 📄 Full answer ({len(text):,} characters) attached as {filename}."
+    )
+    document = InputFile(io.BytesIO(text.encode("utf-8")), filename=filename)
+    await message.reply_document(document=document)
+    logger.info(f"Delivered {len(text)} character answer as document {filename}")
+    return 2
@@ -0,0 +1,143 @@
+# modules/http_listener.py
+
+import asyncio
+import hmac
+import json
+import logging
+from typing import Awaitable, Callable, Dict, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+Response = Tuple[int, str, bytes]  # status, content type, body
+Handler = Callable[[Dict[str, str], bytes], Awaitable[Response]]
+
+REASONS = {200: "OK", 400: "Bad Request", 401: "Unauthorized", 404: "Not Found", 405: "Method Not Allowed",
+           408: "Request Timeout", 413: "Payload Too Large", 500: "Internal Server Error"}
+
+
+class LocalHTTPServer:
+    """
+    Minimal asyncio HTTP/1.1 listener for local endpoints (webhook ingestion,
+    JSON stats). One request per connection, Content-Length bodies only.
+    Routes map (method, path) to an async handler(headers, body).
+    A client gets read_timeout seconds to send its whole request.
+    """
+
+    def __init__(
+        self,
+        host: str,
+        port: int,
+        routes: Dict[Tuple[str, str], Handler],
+        max_body: int = 1_000_000,
+        read_timeout: float = 10.0,
+    ):
+        self.host = host
+        self.port = port
+        self.routes = routes
+        self.max_body = max_body
+        self.read_timeout = read_timeout
+        self._server: Optional[asyncio.AbstractServer] = None
+
+    async def start(self):
+        self._server = await asyncio.start_server(self._handle, self.host, self.port)
+        self.port = self._server.sockets[0].getsockname()[1]  # resolve port 0
+        logger.info(f"HTTP listener on http://{self.host}:{self.port} → {sorted(p for _, p in self.routes)}")
+
+    async def stop(self):
+        if self._server:
+            self._server.close()
+            await self._server.wait_closed()
+            self._server = None
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        try:
+            status, content_type, body = await self._dispatch(reader)
+        except Exception as e:
+            logger.error(f"HTTP listener error: {e}", exc_info=True)
+            status, content_type, body = 500, "text/plain", b"internal error"
+
+        head = (
+            f"HTTP/1.1 {status} {REASONS.get(status, '')}\r\n"
+            f"Content-Type: {content_type}\r\n"
+            f"Content-Length: {len(body)}\r\n"
+            "Connection: close\r\n\r\n"
+        )
+        try:
+            writer.write(head.encode() + body)
+            await writer.drain()
+        finally:
+            writer.close()
+
+    async def _dispatch(self, reader: asyncio.StreamReader) -> Response:
+        try:
+            request = await asyncio.wait_for(self._read_request(reader), timeout=self.read_timeout)
+        except asyncio.TimeoutError:
+            return 408, "text/plain", b"request timeout"
+        except asyncio.IncompleteReadError:
+            return 400, "text/plain", b"truncated body"
+        if len(request) == 3:  # error response
+            return request
+        method, path, headers, body = request
+
+        handler = self.routes.get((method, path))
+        if handler is None:
+            allowed = any(p == path for _, p in self.routes)
+            return (405, "text/plain", b"method not allowed") if allowed else (404, "text/plain", b"not found")
+        return await handler(headers, body)
+
+    async def _read_request(self, reader: asyncio.StreamReader):
+        """(method, path, headers, body), or an error Response for a malformed request."""
+        request_line = (await reader.readline()).decode("latin-1").strip()
+        parts = request_line.split()
+        if len(parts) < 2:
+            return 400, "text/plain", b"bad request line"
+        method, path = parts[0].upper(), parts[1].split("?", 1)[0]
+
+        headers: Dict[str, str] = {}
+        while True:
+            line = (await reader.readline()).decode("latin-1")
+            if line in ("\r\n", "\n", ""):
+                break
+            name, _, value = line.partition(":")
+            headers[name.strip().lower()] = value.strip()
+
+        try:
+            length = int(headers.get("content-length", "0") or 0)
+        except ValueError:
+            length = -1
+        if length < 0:
+            return 400, "text/plain", b"invalid content-length"
+        if length > self.max_body:
+            return 413, "text/plain", b"payload too large"
+        body = await reader.readexactly(length) if length else b""
+        return method, path, headers, body
+
+
+def telegram_webhook_handler(
+    secret_token: str,
+    sink: Callable[[dict], Awaitable[None]],
+) -> Handler:
+    """
+    Build a handler that validates Telegram's X-Telegram-Bot-Api-Secret-Token
+    header and passes the decoded Update JSON to `sink`. The secret is
+    required: without it anyone who can reach the listener could forge updates.
+    """
+    if not secret_token:
+        raise ValueError("telegram_webhook_handler needs a secret token")
+
+    async def handle(headers: Dict[str, str], body: bytes) -> Response:
+        received = headers.get("x-telegram-bot-api-secret-token", "")
+        if not hmac.compare_digest(received.encode(), secret_token.encode()):
+            logger.warning("Rejected webhook call with invalid secret token")
+            return 401, "text/plain", b"invalid secret token"
+        try:
+            data = json.loads(body or b"{}")
+        except json.JSONDecodeError:
+            return 400, "text/plain", b"invalid json"
+        if not isinstance(data, dict) or "update_id" not in data:
+            return 400, "text/plain", b"not a telegram update"
+
+        await sink(data)
+        return 200, "application/json", b'{"ok":true}'
+
+    return handle
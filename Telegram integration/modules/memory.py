@@ -27,6 +27,7 @@ from datetime import datetime
 import requests
 import numpy as np
 import faiss
+from core.tracing import tracer
 
 
 class MemoryItem(BaseModel):
@@ -48,11 +49,12 @@ class MemoryManager:
         self.embeddings: List[np.ndarray] = []
 
     def _get_embedding(self, text: str) -> np.ndarray:
-        response = requests.post(
-            self.embedding_model_url,
-            json={"model": self.model_name, "prompt": text}
-        )
-        response.raise_for_status()
+        with tracer.span("embedding", chars=len(text)):
+            response = requests.post(
+                self.embedding_model_url,
+                json={"model": self.model_name, "prompt": text}
+            )
+            response.raise_for_status()
         return np.array(response.json()["embedding"], dtype=np.float32)
 
     def add(self, item: MemoryItem):
@@ -1,21 +1,23 @@
 import os
-import json
-import yaml
+import asyncio
+import functools
 import requests
-from pathlib import Path
+from typing import Optional
 import google.generativeai as genai
 from dotenv import load_dotenv
+from core.config import ConfigSnapshot, ConfigStore, shared_config
 
 load_dotenv()
 
-ROOT = Path(__file__).parent.parent
-MODELS_JSON = ROOT / "config" / "models.json"
-PROFILE_YAML = ROOT / "config" / "profiles.yaml"
-
 class ModelManager:
-    def __init__(self):
-        self.config = json.loads(MODELS_JSON.read_text())
-        self.profile = yaml.safe_load(PROFILE_YAML.read_text())
+    def __init__(self, store: Optional[ConfigStore] = None):
+        self.store = store or shared_config()
+        self._configure(self.store.current)
+
+    def _configure(self, snapshot: ConfigSnapshot):
+        self.snapshot = snapshot
+        self.config = snapshot.models
+        self.profile = snapshot.profile
 
         self.text_model_key = self.profile["llm"]["text_generation"]
         self.model_info = self.config["models"][self.text_model_key]
@@ -28,11 +30,17 @@ class ModelManager:
             self.model_name = self.model_info["model"]
 
     async def generate_text(self, prompt: str) -> str:
+        # Pick up a hot-reloaded config (identity check only, no disk reads)
+        if self.store.current is not self.snapshot:
+            self._configure(self.store.current)
+
+        # Both clients block; run them in a worker thread so concurrent requests (and
+        # explore_all's candidate plans) overlap instead of queueing on the event loop
         if self.model_type == "gemini":
-            return self._gemini_generate(prompt)
+            return await asyncio.to_thread(self._gemini_generate, prompt)
 
         elif self.model_type == "ollama":
-            return self._ollama_generate(prompt)
+            return await asyncio.to_thread(self._ollama_generate, prompt)
 
         raise NotImplementedError(f"Unsupported model type: {self.model_type}")
 
@@ -56,3 +64,9 @@ class ModelManager:
         )
         response.raise_for_status()
         return response.json()["response"].strip()
+
+
+@functools.lru_cache(maxsize=None)
+def shared_model_manager() -> ModelManager:
+    """Process-wide ModelManager, so the client is configured once (and again only after a config reload)."""
+    return ModelManager()
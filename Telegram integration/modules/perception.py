@@ -4,10 +4,10 @@ import os
 import re
 import json
 from dotenv import load_dotenv
-from modules.model_manager import ModelManager
+from modules.model_manager import shared_model_manager
 from modules.tools import summarize_tools
 
-model = ModelManager()
+model = shared_model_manager()
 tool_context = summarize_tools(model.get_all_tools()) if hasattr(model, "get_all_tools") else ""
 
 
@@ -0,0 +1,80 @@
+# modules/progress.py
+
+import asyncio
+import time
+import logging
+from typing import Any, List, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class CoalescingEditor:
+    """
+    Turns a stream of progress updates into as few Telegram message edits as
+    possible. update() only records the latest text; at most one edit is sent
+    per min_interval seconds, and intermediate texts that were superseded
+    before the next slot are never sent. Keeps a chat well inside Telegram's
+    flood limits (roughly one edit per second per chat).
+    """
+
+    def __init__(self, message: Any, min_interval: float = 2.0):
+        self.message = message
+        self.min_interval = min_interval
+        self.edits_sent = 0
+        self.updates_seen = 0
+        self._latest: Optional[str] = None
+        self._sent: Optional[str] = getattr(message, "text", None)
+        self._last_edit = time.monotonic()  # the message itself was just sent
+        self._flush_task: Optional[asyncio.Task] = None
+        self._closed = False
+
+    def update(self, text: str):
+        if self._closed:
+            return
+        self.updates_seen += 1
+        self._latest = text
+        if self._flush_task is None or self._flush_task.done():
+            self._flush_task = asyncio.create_task(self._flush_later())
+
+    async def _flush_later(self):
+        delay = self.min_interval - (time.monotonic() - self._last_edit)
+        if delay > 0:
+            await asyncio.sleep(delay)
+        text = self._latest
+        if text is None or text == self._sent:
+            return
+        try:
+            await self.message.edit_text(text)
+            self._sent = text
+            self.edits_sent += 1
+        except Exception as e:
+            logger.debug(f"Progress edit skipped: {e}")
+        finally:
+            self._last_edit = time.monotonic()
+
+    async def close(self):
+        """Stop editing; a pending edit is dropped so the caller can write the final text."""
+        self._closed = True
+        if self._flush_task and not self._flush_task.done():
+            self._flush_task.cancel()
+            try:
+                await self._flush_task
+            except asyncio.CancelledError:
+                pass
+
+
+class ProgressLog:
+    """Header plus the last few progress lines, rendered as one message text."""
+
+    def __init__(self, header: str, max_lines: int = 6):
+        self.header = header
+        self.max_lines = max_lines
+        self.lines: List[str] = []
+
+    def add(self, line: str) -> str:
+        self.lines.append(line)
+        self.lines = self.lines[-self.max_lines:]
+        return self.render()
+
+    def render(self) -> str:
+        return "\n".join([self.header, ""] + self.lines) if self.lines else self.header
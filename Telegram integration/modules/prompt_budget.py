@@ -0,0 +1,154 @@
+# modules/prompt_budget.py
+
+import math
+import re
+from collections import Counter
+from typing import Any, List, Optional
+
+from modules.tools import summarize_tools
+
+# Rough token estimate for prompt budgeting (no tokenizer dependency): ~4 characters per token
+CHARS_PER_TOKEN = 4
+
+_WORD = re.compile(r"[A-Za-z0-9][A-Za-z0-9_\-]*")
+_STOPWORDS = {
+    "a", "an", "and", "are", "as", "at", "be", "by", "did", "do", "does", "for", "from", "his", "her",
+    "how", "in", "is", "it", "its", "me", "much", "of", "on", "or", "that", "the", "their", "then",
+    "this", "to", "via", "was", "what", "when", "where", "which", "who", "why", "with", "you", "your",
+}
+
+
+class PromptBudget:
+    """Approximate token budgets per prompt section (profile `prompt_budget:` section)."""
+
+    def __init__(self, tool_result: int = 1500, memory: int = 800, memory_item: int = 250, tools: int = 1500):
+        self.tool_result = tool_result  # tool output pasted into the next step's query (shared by parallel calls)
+        self.memory = memory            # all retrieved memories in the planning prompt
+        self.memory_item = memory_item  # one retrieved memory
+        self.tools = tools              # tool descriptions
+
+    @classmethod
+    def from_config(cls, section: Optional[dict]) -> "PromptBudget":
+        return cls(**{key: int(value) for key, value in (section or {}).items()})
+
+
+def estimate_tokens(text: str) -> int:
+    return math.ceil(len(text) / CHARS_PER_TOKEN)
+
+
+def _terms(text: str) -> List[str]:
+    return [w for w in (m.lower() for m in _WORD.findall(text)) if len(w) > 1 and w not in _STOPWORDS]
+
+
+def split_chunks(text: str, max_tokens: int = 120) -> List[str]:
+    """Split at blank lines and markdown headings, then lines/sentences, then hard character windows."""
+    max_chars = max_tokens * CHARS_PER_TOKEN
+    blocks = re.split(r"\n\s*\n|\n(?=#{1,6} )", text)
+    chunks: List[str] = []
+    for block in blocks:
+        block = block.strip()
+        if not block:
+            continue
+        if len(block) <= max_chars:
+            chunks.append(block)
+            continue
+        current = ""
+        for piece in re.split(r"(?<=[.!?])\s+|\n", block):
+            while len(piece) > max_chars:  # one huge line/sentence
+                if current:
+                    chunks.append(current)
+                    current = ""
+                chunks.append(piece[:max_chars])
+                piece = piece[max_chars:]
+            if current and len(current) + len(piece) + 1 > max_chars:
+                chunks.append(current)
+                current = ""
+            current = f"{current} {piece}".strip()
+        if current:
+            chunks.append(current)
+    return chunks
+
+
+def relevance_scores(chunks: List[str], task: str) -> List[float]:
+    """BM25-style overlap between each chunk and the task's terms."""
+    task_terms = set(_terms(task))
+    chunk_terms = [Counter(_terms(chunk)) for chunk in chunks]
+    df = Counter(term for terms in chunk_terms for term in terms)
+    n = len(chunks)
+    return [
+        sum((terms[t] / (terms[t] + 1.2)) * math.log(1 + n / df[t]) for t in task_terms if t in terms)
+        for terms in chunk_terms
+    ]
+
+
+def relevant_excerpt(text: str, task: str, max_tokens: int) -> str:
+    """
+    Reduce text to about max_tokens by keeping the chunks most relevant to the
+    task (in their original order) instead of cutting it off at the end.
+    """
+    if estimate_tokens(text) <= max_tokens:
+        return text
+
+    chunks = split_chunks(text, max_tokens=min(120, max(20, max_tokens // 4)))
+    if not chunks:  # whitespace only
+        return text.strip()
+    scores = relevance_scores(chunks, task)
+    scores[0] += 0.01  # on ties, keep the lead (titles, first search hit)
+
+    picked, used = [], 0
+    for i in sorted(range(len(chunks)), key=lambda i: (-scores[i], i)):
+        cost = estimate_tokens(chunks[i]) + 1
+        if used + cost <= max_tokens:
+            picked.append(i)
+            used += cost
+
+    if not picked:
+        best = max(range(len(chunks)), key=lambda i: scores[i])
+        return chunks[best][:max_tokens * CHARS_PER_TOKEN]
+
+    picked.sort()
+    parts = []
+    for prev, i in zip([None] + picked, picked):
+        if prev is not None and i != prev + 1:
+            parts.append("[…]")
+        parts.append(chunks[i])
+    return f"[excerpt: {len(picked)} of {len(chunks)} parts most relevant to the task]\n" + "\n".join(parts)
+
+
+def budget_memory(texts: List[str], task: str, max_tokens: int, per_item: int) -> List[str]:
+    """Memories in retrieval order, each excerpted to per_item, until max_tokens is used."""
+    kept, used = [], 0
+    for text in texts:
+        excerpt = relevant_excerpt(text, task, per_item)
+        cost = estimate_tokens(excerpt)
+        if used + cost > max_tokens:
+            break
+        kept.append(excerpt)
+        used += cost
+    return kept
+
+
+def summarize_tools_within(tools: List[Any], task: str, max_tokens: int) -> str:
+    """
+    summarize_tools() within a budget: every tool stays listed, but when the
+    full list is too long only the tools most relevant to the task keep their
+    full description; the rest get its first line.
+    """
+    full = summarize_tools(tools)
+    if estimate_tokens(full) <= max_tokens:
+        return full
+
+    def short_line(tool) -> str:
+        description = (getattr(tool, "description", "") or "No description provided.").strip()
+        return f"- {tool.name}: {description.splitlines()[0][:120]}"
+
+    lines = [short_line(tool) for tool in tools]
+    used = sum(estimate_tokens(line) + 1 for line in lines)
+    scores = relevance_scores([f"{tool.name} {getattr(tool, 'description', '')}" for tool in tools], task)
+    for i in sorted(range(len(tools)), key=lambda i: -scores[i]):
+        line = summarize_tools([tools[i]])
+        extra = estimate_tokens(line) - estimate_tokens(lines[i])
+        if used + extra <= max_tokens:
+            lines[i] = line
+            used += extra
+    return "\n".join(lines)
@@ -1,8 +1,14 @@
 # telegram_bot.py
 
 import asyncio
-import yaml
+import hashlib
+import itertools
+import json
 import os
+import re
+import time
+import uuid
+import signal
 import logging
 from datetime import datetime
 from pathlib import Path
@@ -11,8 +17,13 @@ from dotenv import load_dotenv
 from telegram import Update
 from telegram.ext import Application, CommandHandler, MessageHandler, filters, ContextTypes
 
-from core.loop import AgentLoop
-from core.session import MultiMCP
+from core.runtime import AgentRuntime
+from core.metrics import metrics
+from modules.admission import AdmissionControl
+from modules.chat_dispatcher import ChatDispatcher, ChatJob, QueueFullError
+from modules.http_listener import LocalHTTPServer, telegram_webhook_handler
+from modules.progress import CoalescingEditor, ProgressLog
+from modules.delivery import deliver_answer
 from modules.excel_export import create_excel_from_result, append_to_excel
 from modules.gmail_sender import send_excel_to_gmail
 
@@ -31,52 +42,124 @@ TELEGRAM_BOT_TOKEN = os.getenv("TELEGRAM_BOT_TOKEN")
 GMAIL_RECIPIENT = os.getenv("GMAIL_RECIPIENT")
 EXCEL_FILE_PATH = os.getenv("EXCEL_FILE_PATH", "exports/agent_results.xlsx")
 USE_APPEND_MODE = os.getenv("USE_APPEND_MODE", "true").lower() == "true"
+BOT_WORKERS = int(os.getenv("BOT_WORKERS", "2"))
+BOT_MAX_QUEUE_PER_CHAT = int(os.getenv("BOT_MAX_QUEUE_PER_CHAT", "10"))
+PROGRESS_EDIT_INTERVAL = float(os.getenv("PROGRESS_EDIT_INTERVAL", "2.0"))  # Min seconds between progress edits
+BACKGROUND_JOB_LIMIT = int(os.getenv("BACKGROUND_JOB_LIMIT", "2"))  # Concurrent Excel/email jobs
+SHUTDOWN_DRAIN_TIMEOUT = float(os.getenv("SHUTDOWN_DRAIN_TIMEOUT", "30"))  # Seconds to finish jobs on shutdown
+MAX_ANSWER_MESSAGES = int(os.getenv("MAX_ANSWER_MESSAGES", "4"))  # Longer answers are sent as a document
+MAX_UPLOAD_MB = int(os.getenv("MAX_UPLOAD_MB", "20"))  # Bot API downloads are capped at 20 MB
+UPLOAD_DIR = Path(__file__).parent / "documents"  # Watched by the documents MCP server (mcp_server_2.py)
 
+# Local JSON stats endpoint (GET /stats); unset or 0 = disabled
+STATS_LISTEN = os.getenv("STATS_LISTEN", "127.0.0.1")
+STATS_PORT = int(os.getenv("STATS_PORT", "0"))
 
-async def process_message_with_agent(user_input: str) -> str:
+# Ingestion: "polling" (default) or "webhook" (local HTTP listener, usually behind a TLS reverse proxy)
+TELEGRAM_MODE = os.getenv("TELEGRAM_MODE", "polling").lower()
+WEBHOOK_LISTEN = os.getenv("WEBHOOK_LISTEN", "127.0.0.1")
+WEBHOOK_PORT = int(os.getenv("WEBHOOK_PORT", "8443"))
+WEBHOOK_PATH = os.getenv("WEBHOOK_PATH", "/telegram")
+WEBHOOK_SECRET = os.getenv("WEBHOOK_SECRET")
+WEBHOOK_URL = os.getenv("WEBHOOK_URL")  # Public URL registered with Telegram; unset = don't call setWebhook
+
+# Only message updates are handled (text messages and commands)
+ALLOWED_UPDATES = [Update.MESSAGE]
+
+
+class BackgroundJobs:
+    """
+    Registry for fire-and-forget work started by handlers (Excel export + email).
+    Holds a reference to every task so none is garbage-collected mid-write,
+    runs at most max_concurrent at once, and drains them on shutdown.
+    """
+    
+    def __init__(self, max_concurrent: int = 2):
+        self._slots = asyncio.Semaphore(max_concurrent)
+        self._tasks: set = set()
+        self.max_concurrent = max_concurrent
+        self.running = 0
+        self.completed = 0
+        self.failed = 0
+        self.cancelled = 0
+    
+    def spawn(self, coro, name: str) -> asyncio.Task:
+        task = asyncio.create_task(self._run(coro), name=name)
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        return task
+    
+    async def _run(self, coro):
+        async with self._slots:
+            self.running += 1
+            try:
+                await coro
+                self.completed += 1
+            except asyncio.CancelledError:
+                self.cancelled += 1
+                raise
+            except Exception as e:
+                self.failed += 1
+                logger.error(f"Background job failed: {e}", exc_info=True)
+            finally:
+                self.running -= 1
+    
+    async def drain(self, timeout: float) -> int:
+        """Wait up to timeout seconds for pending jobs, cancel the rest. Returns how many were cancelled."""
+        if not self._tasks:
+            return 0
+        logger.info(f"Draining {len(self._tasks)} background jobs (up to {timeout:.0f}s)...")
+        _, pending = await asyncio.wait(set(self._tasks), timeout=timeout)
+        for task in pending:
+            task.cancel()
+        await asyncio.gather(*pending, return_exceptions=True)
+        return len(pending)
+    
+    def stats(self) -> dict:
+        return {
+            "pending": len(self._tasks),
+            "running": self.running,
+            "waiting": len(self._tasks) - self.running,
+            "completed": self.completed,
+            "failed": self.failed,
+            "cancelled": self.cancelled,
+            "max_concurrent": self.max_concurrent,
+        }
+
+
+background_jobs = BackgroundJobs(max_concurrent=BACKGROUND_JOB_LIMIT)
+
+
+def find_profile_path() -> Path:
+    """Locate config/profiles.yaml (the bot may be started from the repo root or this folder)."""
+    possible_paths = [
+        Path("config/profiles.yaml"),
+        Path("S8 Share/config/profiles.yaml"),
+        Path(__file__).parent.parent / "config" / "profiles.yaml",
+        Path(__file__).parent / "config" / "profiles.yaml",
+    ]
+    for path in possible_paths:
+        if path.exists():
+            return path
+    raise FileNotFoundError("Could not find config/profiles.yaml in any expected location")
+
+
+async def process_message_with_agent(user_input: str, runtime: AgentRuntime, on_event=None) -> str:
     """
     Process a user message through the agent and return the result.
     
     Args:
         user_input: The message from Telegram
+        runtime: The application-wide agent runtime created in main()
+        on_event: Optional AgentLoop progress callback
         
     Returns:
         The agent's final answer
     """
+    started = time.perf_counter()
     try:
-        # Load MCP server configs from profiles.yaml
-        # Try multiple possible paths
-        possible_paths = [
-            Path("config/profiles.yaml"),
-            Path("S8 Share/config/profiles.yaml"),
-            Path(__file__).parent.parent / "config" / "profiles.yaml",
-            Path(__file__).parent / "config" / "profiles.yaml",
-        ]
-        
-        config_path = None
-        for path in possible_paths:
-            if path.exists():
-                config_path = path
-                break
-        
-        if not config_path:
-            raise FileNotFoundError("Could not find config/profiles.yaml in any expected location")
-        
-        with open(config_path, "r") as f:
-            profile = yaml.safe_load(f)
-            mcp_servers = profile.get("mcp_servers", [])
-        
-        # Initialize MCP
-        multi_mcp = MultiMCP(server_configs=mcp_servers)
-        await multi_mcp.initialize()
-        
-        # Create and run agent
-        agent = AgentLoop(
-            user_input=user_input,
-            dispatcher=multi_mcp
-        )
-        
-        final_response = await agent.run()
+        final_response = await runtime.run(user_input, on_event=on_event)
+        metrics.observe("agent_run", time.perf_counter() - started)
         
         # Clean up the response
         if final_response.startswith("FINAL_ANSWER:"):
@@ -85,27 +168,257 @@ async def process_message_with_agent(user_input: str) -> str:
         return final_response
         
     except Exception as e:
+        metrics.observe("agent_run", time.perf_counter() - started, error=True)
         logger.error(f"Agent processing failed: {e}")
         return f"Error processing your request: {str(e)}"
 
 
+def describe_progress(kind: str, data: dict) -> str:
+    """One progress line for an AgentLoop event."""
+    if kind == "step_started":
+        return f"🔄 Step {data['step']} of {data['max_steps']}"
+    if kind == "perception":
+        return f"🧠 Understood: {data.get('intent') or 'your request'}"
+    if kind == "tool_chosen":
+        return f"🔧 Using {data['tool']}..."
+    if kind == "tool_finished":
+        return f"✔️ {data['tool']} done ({data['seconds']:.1f}s)"
+    if kind == "final_answer":
+        return "✍️ Writing the answer..."
+    return kind
+
+
+async def start_runtime(application: Application) -> None:
+    """post_init hook: build the agent runtime once and share it with all handlers."""
+    runtime = AgentRuntime(find_profile_path())
+    await runtime.start()
+    application.bot_data["runtime"] = runtime
+    
+    dispatcher = ChatDispatcher(
+        run_chat_job,
+        workers=BOT_WORKERS,
+        max_queue_per_chat=BOT_MAX_QUEUE_PER_CHAT
+    )
+    dispatcher.start()
+    application.bot_data["dispatcher"] = dispatcher
+    
+    # Rate limits: profile `admission:` section, overridden by ADMISSION_* env vars
+    application.bot_data["admission"] = AdmissionControl.from_config(runtime.config.get("admission"), os.environ)
+    
+    if STATS_PORT:
+        async def serve_stats(headers, body):
+            return 200, "application/json", json.dumps(collect_stats(application), indent=2).encode()
+        
+        stats_server = LocalHTTPServer(STATS_LISTEN, STATS_PORT, {("GET", "/stats"): serve_stats})
+        await stats_server.start()
+        application.bot_data["stats_server"] = stats_server
+
+
+async def drain_work(application: Application) -> None:
+    """
+    post_stop hook (SIGTERM/SIGINT): let running dispatcher jobs, then
+    background jobs, finish within SHUTDOWN_DRAIN_TIMEOUT while the bot can
+    still send their replies. Users whose requests are dropped are told so.
+    """
+    deadline = time.monotonic() + SHUTDOWN_DRAIN_TIMEOUT
+    dispatcher = application.bot_data.pop("dispatcher", None)
+    if dispatcher:
+        pending = dispatcher.take_pending()
+        await notify_dropped(pending, "🛑 The bot is restarting and your request was not started.")
+        unfinished = await dispatcher.drain(SHUTDOWN_DRAIN_TIMEOUT)
+        await notify_dropped(unfinished, "🛑 The bot is restarting and could not finish your request.")
+        if pending or unfinished:
+            logger.warning(f"Shutdown dropped {len(pending)} queued and {len(unfinished)} running requests")
+    
+    cancelled = await background_jobs.drain(max(0.0, deadline - time.monotonic()))
+    if cancelled:
+        logger.warning(f"Cancelled {cancelled} background jobs that missed the shutdown deadline")
+
+
+async def notify_dropped(jobs: list, reason: str) -> None:
+    """Tell the senders of dispatcher jobs that will never run to send them again."""
+    async def notify(job: ChatJob):
+        _, update, _ = job.payload
+        try:
+            await update.message.reply_text(f"{reason} Please send it again in a minute.")
+        except Exception as e:
+            logger.warning(f"Could not notify chat {job.chat_id} about its dropped request: {e}")
+    
+    await asyncio.gather(*(notify(job) for job in jobs))
+
+
+async def stop_runtime(application: Application) -> None:
+    """post_shutdown hook: stop the stats endpoint and pooled MCP servers."""
+    stats_server = application.bot_data.pop("stats_server", None)
+    if stats_server:
+        await stats_server.stop()
+    
+    runtime = application.bot_data.pop("runtime", None)
+    if runtime:
+        await runtime.shutdown()
+        logger.info("Agent runtime shut down")
+
+
 async def handle_message(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
-    """Handle incoming Telegram messages."""
-    user_message = update.message.text
+    """Handle incoming Telegram messages by queueing them on the chat dispatcher."""
     user_id = update.effective_user.id
     username = update.effective_user.username or "Unknown"
     
-    logger.info(f"Received message from {username} ({user_id}): {user_message}")
+    logger.info(f"Received message from {username} ({user_id}): {update.message.text}")
+    metrics.incr("messages_received")
+    await admit_and_queue(update, context, process_update)
+
+
+async def handle_document(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    """Handle document uploads by queueing them for indexing into the knowledge base."""
+    document = update.message.document
+    username = update.effective_user.username or "Unknown"
+    
+    logger.info(f"Received document from {username}: {document.file_name} ({document.file_size} bytes)")
+    metrics.incr("uploads_received")
+    
+    if document.file_size and document.file_size > MAX_UPLOAD_MB * 1024 * 1024:
+        await update.message.reply_text(f"📦 That file is too large. The limit is {MAX_UPLOAD_MB} MB.")
+        return
+    
+    await admit_and_queue(update, context, index_upload)
+
+
+async def admit_and_queue(update: Update, context: ContextTypes.DEFAULT_TYPE, handler) -> None:
+    """Rate-limit, then queue handler(update, context) on the chat dispatcher (FIFO per chat)."""
+    user_id = update.effective_user.id
+    
+    # Cheap admission check before anything reaches the queue, AgentLoop or the LLM
+    admission: AdmissionControl = context.application.bot_data["admission"]
+    decision = admission.admit(user_id, update.effective_chat.id)
+    if not decision.admitted:
+        metrics.incr("rate_limited")
+        if not decision.notify:  # already told during this wait window
+            return
+        who = {"user": "You are", "chat": "This chat is", "global": "The bot is"}[decision.scope]
+        await update.message.reply_text(
+            f"🚦 {who} sending requests too fast. Please try again in {decision.retry_after:.0f}s."
+        )
+        return
+    
+    dispatcher: ChatDispatcher = context.application.bot_data["dispatcher"]
+    try:
+        ahead = dispatcher.submit(update.effective_chat.id, (handler, update, context))
+    except QueueFullError:
+        metrics.incr("queue_full")
+        await update.message.reply_text(
+            "🚦 You already have too many requests waiting. Please wait for them to finish."
+        )
+        return
     
-    # Send "processing" message
+    if ahead:
+        await update.message.reply_text(f"⏳ Busy right now — your request is #{ahead + 1} in the queue.")
+
+
+async def run_chat_job(job: ChatJob) -> None:
+    """Dispatcher worker entry point: run one queued message or upload."""
+    handler, update, context = job.payload
+    await handler(update, context)
+
+
+def safe_upload_name(file_name: str) -> str:
+    """Reduce an uploaded file name to a plain name inside UPLOAD_DIR."""
+    name = re.sub(r"[^\w.\- ]", "_", Path(file_name or "").name).strip(" .")
+    return name or f"upload_{datetime.now():%Y%m%d_%H%M%S}"
+
+
+def file_md5(path: Path) -> str:
+    digest = hashlib.md5()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def claim_upload_name(partial: Path, name: str) -> str:
+    """
+    Move a finished download into UPLOAD_DIR as `name`, or "stem (2).ext", ...
+    when that name holds a different file; another upload is never overwritten.
+    A byte-identical file keeps its existing name (indexing reports it unchanged).
+    """
+    digest = file_md5(partial)
+    stem, suffix = Path(name).stem, Path(name).suffix
+    for n in itertools.count(1):
+        candidate = name if n == 1 else f"{stem} ({n}){suffix}"
+        target = UPLOAD_DIR / candidate
+        try:
+            with open(target, "x"):  # reserve the name atomically
+                pass
+        except FileExistsError:
+            if target.stat().st_size and file_md5(target) == digest:
+                partial.unlink()
+                return candidate
+            continue
+        os.replace(partial, target)
+        return candidate
+
+
+async def index_upload(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    """Stream an uploaded document into UPLOAD_DIR and index just that file via the documents server."""
+    name = safe_upload_name(update.message.document.file_name)
+    status_msg = await update.message.reply_text(f"📥 Receiving {name}...")
+    
+    # Download under a unique hidden .part name so the startup scan never picks up a
+    # half-written file and concurrent uploads of the same name don't share one
+    UPLOAD_DIR.mkdir(exist_ok=True)
+    partial = UPLOAD_DIR / f".{uuid.uuid4().hex}.part"
+    try:
+        telegram_file = await update.message.document.get_file()
+        await telegram_file.download_to_drive(custom_path=partial)
+        name = await asyncio.to_thread(claim_upload_name, partial, name)
+        
+        await status_msg.edit_text(f"🗂️ Saved {name}, indexing...")
+        runtime: AgentRuntime = context.application.bot_data["runtime"]
+        with metrics.timer("document_indexing"):
+            response = await runtime.mcp.call_tool("index_document", {"input": {"file_path": name}})
+        
+        text = response.content[0].text if response.content else ""
+        if response.isError:
+            raise RuntimeError(text or "indexing failed")
+        result = json.loads(text)
+        
+        if result["status"] == "empty":
+            await status_msg.edit_text(f"⚠️ Saved {name}, but no text could be extracted from it.")
+        elif result["status"] == "unchanged":
+            await status_msg.edit_text(f"✅ {name} was already indexed ({result['chunks']} chunks).")
+        else:
+            await status_msg.edit_text(f"✅ {name} indexed: {result['chunks']} chunks are now searchable.")
+    
+    except Exception as e:
+        metrics.incr("upload_errors")
+        logger.error(f"Failed to index upload {name}: {e}", exc_info=True)
+        partial.unlink(missing_ok=True)
+        await status_msg.edit_text(f"❌ Could not index {name}: {str(e)}")
+
+
+async def process_update(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    """Run the agent for one message, reply with the result, then save and email it."""
+    user_message = update.message.text
+    user_id = update.effective_user.id
+    username = update.effective_user.username or "Unknown"
+    
+    # Send "processing" message, then stream coalesced progress edits into it
     processing_msg = await update.message.reply_text("🤔 Processing your request...")
+    progress = ProgressLog("🤔 Processing your request...")
+    editor = CoalescingEditor(processing_msg, min_interval=PROGRESS_EDIT_INTERVAL)
+    
+    def on_event(kind: str, data: dict) -> None:
+        editor.update(progress.add(describe_progress(kind, data)))
     
     try:
         # Process message through agent
-        agent_response = await process_message_with_agent(user_message)
+        agent_response = await process_message_with_agent(
+            user_message, context.application.bot_data["runtime"], on_event=on_event
+        )
+        await editor.close()
         
-        # Send result immediately (don't wait for Excel/email)
-        await processing_msg.edit_text(f"✅ Result:\n\n{agent_response}")
+        # Send result immediately (don't wait for Excel/email); long answers are split or attached
+        await deliver_answer(processing_msg, agent_response, max_parts=MAX_ANSWER_MESSAGES)
         
         # Prepare metadata
         metadata = {
@@ -117,19 +430,20 @@ async def handle_message(update: Update, context: ContextTypes.DEFAULT_TYPE) ->
         # Export to Excel and send email in background (non-blocking)
         async def save_and_email():
             try:
-                if USE_APPEND_MODE:
-                    excel_path = append_to_excel(
-                        user_message=user_message,
-                        agent_response=agent_response,
-                        excel_path=EXCEL_FILE_PATH,
-                        metadata=metadata
-                    )
-                else:
-                    excel_path = create_excel_from_result(
-                        user_message=user_message,
-                        agent_response=agent_response,
-                        metadata=metadata
-                    )
+                with metrics.timer("excel_export"):
+                    if USE_APPEND_MODE:
+                        excel_path = append_to_excel(
+                            user_message=user_message,
+                            agent_response=agent_response,
+                            excel_path=EXCEL_FILE_PATH,
+                            metadata=metadata
+                        )
+                    else:
+                        excel_path = create_excel_from_result(
+                            user_message=user_message,
+                            agent_response=agent_response,
+                            metadata=metadata
+                        )
                 
                 logger.info(f"Excel file created/updated: {excel_path}")
                 
@@ -137,12 +451,14 @@ async def handle_message(update: Update, context: ContextTypes.DEFAULT_TYPE) ->
                 if GMAIL_RECIPIENT:
                     # Run email sending in executor to avoid blocking
                     loop = asyncio.get_event_loop()
+                    email_started = time.perf_counter()
                     success = await loop.run_in_executor(
                         None,
                         send_excel_to_gmail,
                         excel_path,
                         GMAIL_RECIPIENT
                     )
+                    metrics.observe("email", time.perf_counter() - email_started, error=not success)
                     
                     if success:
                         await update.message.reply_text(
@@ -166,11 +482,13 @@ async def handle_message(update: Update, context: ContextTypes.DEFAULT_TYPE) ->
                 except:
                     pass
         
-        # Start background task (don't await - let it run in background)
-        asyncio.create_task(save_and_email())
+        # Start tracked background job (don't await - let it run in background)
+        background_jobs.spawn(save_and_email(), name=f"save_and_email:{update.effective_chat.id}")
             
     except Exception as e:
+        metrics.incr("request_errors")
         logger.error(f"Error handling message: {e}")
+        await editor.close()
         await processing_msg.edit_text(f"❌ Error: {str(e)}")
 
 
@@ -197,14 +515,19 @@ async def help_command(update: Update, context: ContextTypes.DEFAULT_TYPE) -> No
 /start - Start the bot and see welcome message
 /help - Show this help message
 /status - Check bot status
+/stats - Latency percentiles and counters
 
 Just send a message to get it processed by the agent!
+Send a document (PDF, HTML, Word, ...) to add it to the searchable knowledge base.
 """
     await update.message.reply_text(help_text)
 
 
 async def status_command(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
     """Handle the /status command."""
+    queue = context.application.bot_data["dispatcher"].stats()
+    jobs = background_jobs.stats()
+    limits = context.application.bot_data["admission"].stats()
     status_info = f"""
 📊 Bot Status:
 
@@ -212,28 +535,155 @@ async def status_command(update: Update, context: ContextTypes.DEFAULT_TYPE) ->
 📧 Email recipient: {GMAIL_RECIPIENT or "Not configured"}
 📁 Excel file: {EXCEL_FILE_PATH}
 🔄 Append mode: {"Enabled" if USE_APPEND_MODE else "Disabled"}
+
+👷 Workers busy: {queue["busy_workers"]}/{queue["workers"]}
+📥 Queued requests: {queue["queue_depth"]} across {queue["chats_waiting"]} chats
+⏱️ Queue wait: avg {queue["wait_avg"]:.1f}s, p95 {queue["wait_p95"]:.1f}s, max {queue["wait_max"]:.1f}s
+
+🗂️ Background jobs: {jobs["running"]} running, {jobs["waiting"]} waiting (limit {jobs["max_concurrent"]})
+   done {jobs["completed"]}, failed {jobs["failed"]}, cancelled {jobs["cancelled"]}
+
+🚦 Admitted {limits["admitted"]}, rate-limited {limits["rejected_user"]} (user) / {limits["rejected_chat"]} (chat) / {limits["rejected_global"]} (global)
 """
     await update.message.reply_text(status_info)
 
 
+def collect_stats(application: Application) -> dict:
+    """Everything /stats and the JSON endpoint report."""
+    stats = metrics.snapshot()
+    dispatcher = application.bot_data.get("dispatcher")
+    admission = application.bot_data.get("admission")
+    stats["queue"] = dispatcher.stats() if dispatcher else {}
+    stats["background_jobs"] = background_jobs.stats()
+    stats["admission"] = admission.stats() if admission else {}
+    runtime = application.bot_data.get("runtime")
+    stats["tool_cache"] = runtime.mcp.result_cache.stats() if runtime else {}
+    stats["servers"] = runtime.mcp.server_health() if runtime else {}
+    return stats
+
+
+async def stats_command(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    """Handle the /stats command."""
+    stats = collect_stats(context.application)
+    counters = stats["counters"]
+    queue = stats["queue"]
+    
+    lines = [
+        "📈 Bot Stats",
+        "",
+        f"⏲️ Uptime: {stats['uptime'] / 60:.0f} min",
+        f"📨 Messages: {counters.get('messages_received', 0)}, "
+        f"rate-limited {counters.get('rate_limited', 0)}, queue full {counters.get('queue_full', 0)}, "
+        f"errors {counters.get('request_errors', 0)}",
+        f"📥 Queue depth: {queue.get('queue_depth', 0)}, workers busy {queue.get('busy_workers', 0)}/{queue.get('workers', 0)}",
+        "",
+        "Latency (s)     p50 / p95 / p99   (n, errors)",
+    ]
+    for stage, s in stats["stages"].items():
+        lines.append(
+            f"• {stage}: {s['p50']:.2f} / {s['p95']:.2f} / {s['p99']:.2f}  ({s['count']}, {s['errors']})"
+        )
+    if not stats["stages"]:
+        lines.append("• no requests yet")
+
+    cache = stats["tool_cache"]
+    if cache:
+        lines += [
+            "",
+            f"🗃️ Tool cache: {cache['hit_rate']:.0%} hits ({cache['hits']}/{cache['hits'] + cache['misses']}), "
+            f"{cache['entries']}/{cache['max_entries']} entries, {cache['evictions']} evicted",
+        ]
+        for tool, t in cache["tools"].items():
+            lines.append(f"• {tool}: {t['hit_rate']:.0%} ({t['hits']} hits, {t['misses']} misses)")
+
+    if stats["servers"]:
+        lines += ["", "🩺 Servers"]
+        for server_id, h in stats["servers"].items():
+            lines.append(f"• {server_id}: {h['state']}, {h['calls']} calls, {h['error_rate']:.0%} errors")
+    
+    await update.message.reply_text("\n".join(lines))
+
+
+async def run_webhook(application: Application) -> None:
+    """
+    Serve Telegram updates from a local HTTP listener instead of polling.
+    Valid POSTs (secret token checked) go straight onto the application's
+    update queue and from there through the normal handlers and dispatcher.
+    """
+    async def enqueue_update(data: dict) -> None:
+        await application.update_queue.put(Update.de_json(data, application.bot))
+    
+    listener = LocalHTTPServer(
+        WEBHOOK_LISTEN,
+        WEBHOOK_PORT,
+        {("POST", WEBHOOK_PATH): telegram_webhook_handler(WEBHOOK_SECRET, enqueue_update)}
+    )
+    
+    stop_event = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        try:
+            loop.add_signal_handler(sig, stop_event.set)
+        except NotImplementedError:
+            pass  # Windows: Ctrl+C raises KeyboardInterrupt instead
+    
+    # post_init/post_stop/post_shutdown only run under run_polling/run_webhook, so call them here
+    async with application:
+        await start_runtime(application)
+        await application.start()
+        await listener.start()
+        
+        if WEBHOOK_URL:
+            await application.bot.set_webhook(
+                url=WEBHOOK_URL,
+                secret_token=WEBHOOK_SECRET,
+                allowed_updates=ALLOWED_UPDATES
+            )
+            logger.info(f"Webhook registered: {WEBHOOK_URL}")
+        
+        try:
+            await stop_event.wait()
+        finally:
+            await listener.stop()
+            await application.stop()
+            await drain_work(application)
+            await stop_runtime(application)
+
+
 def main():
     """Start the Telegram bot."""
     if not TELEGRAM_BOT_TOKEN:
         logger.error("TELEGRAM_BOT_TOKEN not set in environment variables!")
         raise ValueError("TELEGRAM_BOT_TOKEN is required")
+    if TELEGRAM_MODE == "webhook" and not WEBHOOK_SECRET:
+        logger.error("WEBHOOK_SECRET not set; refusing to accept unauthenticated webhook updates!")
+        raise ValueError("WEBHOOK_SECRET is required in webhook mode")
     
-    # Create application
-    application = Application.builder().token(TELEGRAM_BOT_TOKEN).build()
+    # Create application (the agent runtime lives for the whole application)
+    application = (
+        Application.builder()
+        .token(TELEGRAM_BOT_TOKEN)
+        .post_init(start_runtime)
+        .post_stop(drain_work)
+        .post_shutdown(stop_runtime)
+        .build()
+    )
     
     # Register handlers
     application.add_handler(CommandHandler("start", start_command))
     application.add_handler(CommandHandler("help", help_command))
     application.add_handler(CommandHandler("status", status_command))
+    application.add_handler(CommandHandler("stats", stats_command))
     application.add_handler(MessageHandler(filters.TEXT & ~filters.COMMAND, handle_message))
+    application.add_handler(MessageHandler(filters.Document.ALL, handle_document))
     
     # Start the bot
-    logger.info("Starting Telegram bot...")
-    application.run_polling(allowed_updates=Update.ALL_TYPES)
+    if TELEGRAM_MODE == "webhook":
+        logger.info(f"Starting Telegram bot in webhook mode on {WEBHOOK_LISTEN}:{WEBHOOK_PORT}{WEBHOOK_PATH}...")
+        asyncio.run(run_webhook(application))
+    else:
+        logger.info("Starting Telegram bot...")
+        application.run_polling(allowed_updates=ALLOWED_UPDATES)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,60 @@
+# test_admission.py
+# Offline check of admission control: token buckets per user/chat/global and one notice per window
+
+import time
+
+from modules.admission import AdmissionControl
+
+
+def test_limits_per_scope():
+    admission = AdmissionControl(user_per_minute=60, user_burst=2, chat_per_minute=0, global_per_minute=0)
+
+    decisions = [admission.admit(user_id=1, chat_id=10) for _ in range(3)]
+    other_user = admission.admit(user_id=2, chat_id=10)
+    print(f"user 1 → {[d.admitted for d in decisions]}, user 2 → {other_user.admitted}")
+
+    assert [d.admitted for d in decisions] == [True, True, False]
+    assert decisions[2].scope == "user" and 0 < decisions[2].retry_after <= 1.0
+    assert other_user.admitted  # one user's burst does not block another
+
+    busy_chat = AdmissionControl(user_per_minute=0, chat_per_minute=60, chat_burst=1, global_per_minute=0)
+    assert busy_chat.admit(1, 10).admitted
+    assert busy_chat.admit(2, 10).scope == "chat"
+    assert busy_chat.admit(2, 11).admitted
+    assert busy_chat.stats()["rejected_chat"] == 1
+
+
+def test_one_notice_per_window():
+    """A flood gets one "too fast" notice; the next one only after the wait has passed."""
+    admission = AdmissionControl(user_per_minute=600, user_burst=1, chat_per_minute=0, global_per_minute=0)
+    assert admission.admit(1, 10).admitted
+
+    flood = [admission.admit(1, 10) for _ in range(5)]
+    assert not any(d.admitted for d in flood)
+    assert [d.notify for d in flood] == [True, False, False, False, False]
+    assert admission.admit(1, 11).notify  # same user in another chat is told there too
+
+    time.sleep(flood[0].retry_after + 0.02)
+    assert admission.admit(1, 10).admitted
+    assert admission.admit(1, 10).notify
+
+
+def test_from_config_env_overrides():
+    admission = AdmissionControl.from_config(
+        {"user_per_minute": 5, "global_burst": 20},
+        {"ADMISSION_USER_PER_MINUTE": "12"}
+    )
+    assert admission.user_limits == (12 / 60.0, 3)
+    assert admission.global_bucket.burst == 20
+
+
+if __name__ == "__main__":
+    print("=" * 60)
+    print("Testing Admission Control (offline)")
+    print("=" * 60)
+    print()
+    test_limits_per_scope()
+    test_one_notice_per_window()
+    test_from_config_env_overrides()
+    print()
+    print("✅ Admission control works!")
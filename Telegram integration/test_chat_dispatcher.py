@@ -0,0 +1,81 @@
+# test_chat_dispatcher.py
+# Offline check of the chat dispatcher: FIFO per chat, fair across chats, bounded, drains on shutdown
+
+import asyncio
+
+from modules.chat_dispatcher import ChatDispatcher, QueueFullError
+
+
+def test_fifo_per_chat_and_fair_across_chats():
+    async def scenario():
+        order, running = [], set()
+
+        async def handler(job):
+            chat_id, n = job.payload
+            assert chat_id not in running, "two jobs of one chat ran at once"
+            running.add(chat_id)
+            await asyncio.sleep(0.01)
+            running.discard(chat_id)
+            order.append(job.payload)
+
+        dispatcher = ChatDispatcher(handler, workers=2, max_queue_per_chat=3)
+        dispatcher.start()
+        positions = [dispatcher.submit(1, (1, n)) for n in range(3)]
+        positions.append(dispatcher.submit(2, (2, 0)))
+        try:
+            dispatcher.submit(1, (1, 3))
+            raise AssertionError("queue limit not enforced")
+        except QueueFullError:
+            pass
+
+        await asyncio.sleep(0.2)
+        await dispatcher.stop()
+        return order, positions, dispatcher.stats()
+
+    order, positions, stats = asyncio.run(scenario())
+    print(f"order → {order}, queue positions → {positions}")
+
+    assert [n for chat, n in order if chat == 1] == [0, 1, 2]
+    assert order.index((2, 0)) < order.index((1, 1))  # chat 2 does not wait behind chat 1's backlog
+    assert positions == [0, 1, 2, 0]
+    assert stats["processed"] == 4 and stats["queue_depth"] == 0
+
+
+def test_drain_on_shutdown():
+    """Queued jobs come back for a notice; a running job gets the timeout, then is cancelled."""
+    async def scenario():
+        async def handler(job):
+            await asyncio.sleep(job.payload)
+
+        dispatcher = ChatDispatcher(handler, workers=1)
+        dispatcher.start()
+        dispatcher.submit(1, 0.05)
+        dispatcher.submit(1, 0.05)
+        dispatcher.submit(2, 0.05)
+        await asyncio.sleep(0.01)
+        pending = dispatcher.take_pending()
+        finished = await dispatcher.drain(1.0)
+
+        dispatcher.start()
+        dispatcher.submit(3, 5.0)
+        await asyncio.sleep(0.01)
+        cancelled = await dispatcher.drain(0.05)
+        return pending, finished, cancelled, dispatcher.processed
+
+    pending, finished, cancelled, processed = asyncio.run(scenario())
+    print(f"dropped from queue → {len(pending)}, cancelled at the deadline → {len(cancelled)}")
+
+    assert [(job.chat_id, job.payload) for job in pending] == [(1, 0.05), (2, 0.05)]
+    assert finished == [] and processed == 1
+    assert [(job.chat_id, job.payload) for job in cancelled] == [(3, 5.0)]
+
+
+if __name__ == "__main__":
+    print("=" * 60)
+    print("Testing Chat Dispatcher (offline)")
+    print("=" * 60)
+    print()
+    test_fifo_per_chat_and_fair_across_chats()
+    test_drain_on_shutdown()
+    print()
+    print("✅ Chat dispatcher works!")
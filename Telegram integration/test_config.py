@@ -0,0 +1,84 @@
+# test_config.py
+# Offline check of the config snapshot: read-only, hot reload, and an invalid edit keeping the old config
+
+import shutil
+import tempfile
+from pathlib import Path
+
+from core.config import ConfigError, ConfigSnapshot, ConfigStore
+
+CONFIG_DIR = Path(__file__).parent / "config"
+
+
+def config_copy() -> Path:
+    """profiles.yaml + models.json copied to a temp folder the test may edit."""
+    folder = Path(tempfile.mkdtemp())
+    shutil.copy(CONFIG_DIR / "profiles.yaml", folder)
+    shutil.copy(CONFIG_DIR / "models.json", folder)
+    return folder / "profiles.yaml"
+
+
+def test_snapshot_is_read_only():
+    snapshot = ConfigStore(config_copy()).current
+    for mutate in (
+        lambda: setattr(snapshot, "version", ()),
+        lambda: snapshot.profile.__setitem__("strategy", {}),
+        lambda: snapshot.profile["strategy"].__setitem__("max_steps", 99),
+    ):
+        try:
+            mutate()
+            raise AssertionError("snapshot was modified")
+        except (AttributeError, TypeError):
+            pass
+
+
+def test_reload_swaps_or_keeps_previous():
+    profile_path = config_copy()
+    store = ConfigStore(profile_path)
+    swaps = []
+    store.subscribe(lambda old, new: swaps.append((old, new)))
+    original = store.current
+    text = profile_path.read_text()
+
+    assert store.reload() is False  # nothing changed
+
+    profile_path.write_text(text.replace("max_steps: 3 ", "max_steps: 5 "))
+    assert store.reload() is True
+    assert store.current.profile["strategy"]["max_steps"] == 5
+    assert swaps == [(original, store.current)]
+    assert original.profile["strategy"]["max_steps"] == 3  # a run holding the old snapshot is unaffected
+
+    # Invalid edits are reported and the last good snapshot stays current
+    good = store.current
+    for broken in (
+        text.replace("max_steps: 3 ", "max_steps: zero "),
+        text.replace("planning_mode: two_call", "planning_mode: fused").replace("type: conservative", "type: explore_all"),
+        "strategy: [unclosed",
+    ):
+        profile_path.write_text(broken)
+        assert store.reload() is False
+        assert store.current is good
+    assert len(swaps) == 1
+
+
+def test_validation_errors():
+    profile_path = config_copy()
+    profile_path.write_text(profile_path.read_text().replace("planning_mode: two_call", "planning_mode: three_call"))
+    try:
+        ConfigSnapshot.load(profile_path, profile_path.parent / "models.json")
+        raise AssertionError("invalid planning_mode accepted")
+    except ConfigError as e:
+        print(f"rejected → {e}")
+        assert "planning_mode" in str(e)
+
+
+if __name__ == "__main__":
+    print("=" * 60)
+    print("Testing Config Snapshot and Reload (offline)")
+    print("=" * 60)
+    print()
+    test_snapshot_is_read_only()
+    test_reload_swaps_or_keeps_previous()
+    test_validation_errors()
+    print()
+    print("✅ Config snapshots and reload work!")
@@ -0,0 +1,62 @@
+# test_delivery.py
+# Offline check of long-answer delivery: every message sent must fit Telegram's limit
+
+import asyncio
+
+from modules.delivery import TELEGRAM_MESSAGE_LIMIT, deliver_answer, telegram_len
+
+
+class RecordingMessage:
+    """Stands in for the "Processing..." Message; records what would be sent."""
+
+    def __init__(self):
+        self.sent = []
+        self.documents = 0
+
+    async def edit_text(self, text):
+        self.sent.append(text)
+
+    async def reply_text(self, text):
+        self.sent.append(text)
+
+    async def reply_document(self, document):
+        self.documents += 1
+
+
+ANSWERS = {
+    "two paragraphs": "a" * 4000 + "\n\n" + "b" * 4091,
+    "split inside a code fence": "Here it is:\n```python\n" + "x = 1\n" * 1500 + "```\nDone.",
+    "emoji (2 UTF-16 units each)": "🙂 " * 3000,
+    "no separators": "z" * 12000,
+}
+
+
+def test_every_part_fits():
+    for name, answer in ANSWERS.items():
+        message = RecordingMessage()
+        count = asyncio.run(deliver_answer(message, answer))
+        longest = max(telegram_len(text) for text in message.sent)
+        print(f"{name}: {count} message(s), longest {longest} UTF-16 units")
+
+        assert message.documents == 0
+        assert longest <= TELEGRAM_MESSAGE_LIMIT, (name, longest)
+        if "```" in answer:
+            assert all(text.count("```") % 2 == 0 for text in message.sent), name
+
+
+def test_very_long_answer_becomes_document():
+    message = RecordingMessage()
+    asyncio.run(deliver_answer(message, "word " * 20000))
+    assert message.documents == 1
+    assert all(telegram_len(text) <= TELEGRAM_MESSAGE_LIMIT for text in message.sent)
+
+
+if __name__ == "__main__":
+    print("=" * 60)
+    print("Testing Answer Delivery (offline)")
+    print("=" * 60)
+    print()
+    test_every_part_fits()
+    test_very_long_answer_becomes_document()
+    print()
+    print("✅ Every delivered message fits Telegram's limit!")
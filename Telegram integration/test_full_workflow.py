@@ -51,7 +51,10 @@ async def test_agent_and_email():
             dispatcher=multi_mcp
         )
         
-        final_response = await agent.run()
+        try:
+            final_response = await agent.run()
+        finally:
+            await multi_mcp.shutdown()
         
         # Clean up the response
         if final_response.startswith("FINAL_ANSWER:"):
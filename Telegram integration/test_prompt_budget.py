@@ -0,0 +1,60 @@
+# test_prompt_budget.py
+# Offline check of tool-result parsing and task-relevant excerpting for prompts
+
+from types import SimpleNamespace
+
+from modules.action import tool_result_text
+from modules.prompt_budget import estimate_tokens, relevant_excerpt
+
+TASK = "How much did Anmol Singh pay for his DLF apartment?"
+
+
+def tool_response(*texts: str) -> SimpleNamespace:
+    """Shape of an MCP CallToolResult: a list of TextContent items."""
+    return SimpleNamespace(content=[SimpleNamespace(type="text", text=t) for t in texts])
+
+
+def test_structured_results():
+    """JSON results without a markdown field stay as their JSON text; markdown results are unwrapped."""
+    ascii_values = tool_result_text(tool_response('{"result": [73, 78, 68, 73, 65]}'))
+    pdf = tool_result_text(tool_response('{"markdown": "# DLF\\nPaid 4.2 crore"}'))
+    search = tool_response("first chunk", "second chunk")
+
+    print(f"strings_to_chars_to_int → {ascii_values}")
+    print(f"extract_pdf → {pdf!r}")
+
+    assert ascii_values == '{"result": [73, 78, 68, 73, 65]}'
+    assert pdf == "# DLF\nPaid 4.2 crore"
+    assert tool_result_text(search) == "first chunk\n\nsecond chunk"
+    assert tool_result_text(tool_response('{"markdown": null}')) == '{"markdown": null}'
+
+    # Short structured results pass through the budget untouched
+    assert relevant_excerpt(ascii_values, TASK, 100) == ascii_values
+
+
+def test_excerpt_keeps_relevant_part():
+    """A long tool result is cut to budget around the passage that answers the task."""
+    filler = "\n\n".join(f"## Section {i}\nNotes on weather and gardening, item {i}." for i in range(200))
+    document = f"{filler}\n\nAnmol Singh paid 4.2 crore for the DLF apartment in 2021.\n\n{filler}"
+
+    excerpt = relevant_excerpt(document, TASK, 200)
+    print(f"{estimate_tokens(document)} tokens → {estimate_tokens(excerpt)} tokens")
+
+    assert estimate_tokens(excerpt) <= 200 + 20  # budget plus the excerpt header
+    assert "Anmol Singh paid 4.2 crore" in excerpt
+
+
+def test_excerpt_whitespace_only():
+    assert relevant_excerpt(" \n\n " * 1000, TASK, 10) == ""
+
+
+if __name__ == "__main__":
+    print("=" * 60)
+    print("Testing Prompt Budgeting (offline)")
+    print("=" * 60)
+    print()
+    test_structured_results()
+    test_excerpt_keeps_relevant_part()
+    test_excerpt_whitespace_only()
+    print()
+    print("✅ Prompt budgeting works!")
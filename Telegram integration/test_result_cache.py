@@ -0,0 +1,62 @@
+# test_result_cache.py
+# Offline check of the tool result cache: keys, TTL, version stamps and LRU bound
+
+import os
+import tempfile
+import time
+
+from core.result_cache import ToolResultCache, files_version
+
+
+def test_hits_ttl_and_eviction():
+    cache = ToolResultCache(max_entries=2)
+    cache.put("search", {"query": "dlf", "top_k": 3}, "hit", ttl=60)
+
+    # Argument order does not matter; different arguments are a different entry
+    assert cache.get("search", {"top_k": 3, "query": "dlf"}) == "hit"
+    assert cache.get("search", {"query": "dlf", "top_k": 5}) is None
+
+    cache.put("short", {}, "gone soon", ttl=0.05)
+    time.sleep(0.1)
+    assert cache.get("short", {}) is None
+
+    # LRU: reading "search" keeps it; the oldest untouched entry goes
+    cache.put("a", {}, 1, ttl=60)
+    cache.get("search", {"query": "dlf", "top_k": 3})
+    cache.put("b", {}, 2, ttl=60)
+    assert cache.get("a", {}) is None
+    assert cache.get("search", {"query": "dlf", "top_k": 3}) == "hit"
+
+    stats = cache.stats()
+    print(f"stats → {stats}")
+    assert stats["entries"] == 2 and stats["evictions"] == 1
+    assert stats["tools"]["search"] == {"hits": 3, "misses": 1, "hit_rate": 0.75}
+
+
+def test_version_change_invalidates():
+    """An entry stamped with files_version() is missed once the file it depends on changes."""
+    with tempfile.TemporaryDirectory() as cwd:
+        index = os.path.join(cwd, "index.bin")
+        with open(index, "w") as f:
+            f.write("v1")
+        cache = ToolResultCache()
+        version = files_version(["index.bin"], cwd)
+        cache.put("search_documents", {"query": "dlf"}, "old", ttl=60, version=version)
+        assert cache.get("search_documents", {"query": "dlf"}, files_version(["index.bin"], cwd)) == "old"
+
+        with open(index, "w") as f:
+            f.write("v2, re-indexed")
+        assert files_version(["index.bin"], cwd) != version
+        assert cache.get("search_documents", {"query": "dlf"}, files_version(["index.bin"], cwd)) is None
+        assert files_version(["missing.bin"], cwd) == (None,)
+
+
+if __name__ == "__main__":
+    print("=" * 60)
+    print("Testing Tool Result Cache (offline)")
+    print("=" * 60)
+    print()
+    test_hits_ttl_and_eviction()
+    test_version_change_invalidates()
+    print()
+    print("✅ Tool result cache works!")
@@ -0,0 +1,138 @@
+# test_webhook.py
+# Offline check of webhook ingestion: POST a recorded Update to the local listener
+
+import asyncio
+import json
+import urllib.request
+import urllib.error
+
+from modules.http_listener import LocalHTTPServer, telegram_webhook_handler
+
+SECRET = "test-secret"
+
+# Recorded Update JSON (text message) as Telegram would POST it
+RECORDED_UPDATE = {
+    "update_id": 100000001,
+    "message": {
+        "message_id": 42,
+        "date": 1730900000,
+        "chat": {"id": 123456789, "type": "private", "first_name": "Test"},
+        "from": {"id": 123456789, "is_bot": False, "first_name": "Test", "username": "tester"},
+        "text": "What is the factorial of 5?"
+    }
+}
+
+
+def post(port: int, body: bytes, secret: str) -> int:
+    request = urllib.request.Request(
+        f"http://127.0.0.1:{port}/telegram",
+        data=body,
+        headers={"Content-Type": "application/json", "X-Telegram-Bot-Api-Secret-Token": secret},
+        method="POST"
+    )
+    try:
+        with urllib.request.urlopen(request, timeout=5) as response:
+            return response.status
+    except urllib.error.HTTPError as e:
+        return e.code
+
+
+async def raw_status(port: int, request: bytes) -> int:
+    """Send raw bytes (possibly an incomplete request) and return the response status."""
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    writer.write(request)
+    await writer.drain()
+    status_line = await reader.readline()
+    writer.close()
+    return int(status_line.split()[1])
+
+
+async def run_checks() -> list:
+    received = []
+
+    async def sink(data: dict) -> None:
+        received.append(data)
+
+    listener = LocalHTTPServer(
+        "127.0.0.1", 0,
+        {("POST", "/telegram"): telegram_webhook_handler(SECRET, sink)}
+    )
+    await listener.start()
+    try:
+        body = json.dumps(RECORDED_UPDATE).encode()
+        statuses = [
+            await asyncio.to_thread(post, listener.port, body, SECRET),
+            await asyncio.to_thread(post, listener.port, body, "wrong-secret"),
+            await asyncio.to_thread(post, listener.port, b"not json", SECRET),
+        ]
+    finally:
+        await listener.stop()
+    return [statuses, received]
+
+
+async def run_malformed_checks() -> list:
+    async def sink(data: dict) -> None:
+        raise AssertionError("malformed request reached the sink")
+
+    listener = LocalHTTPServer(
+        "127.0.0.1", 0,
+        {("POST", "/telegram"): telegram_webhook_handler(SECRET, sink)},
+        read_timeout=0.5
+    )
+    await listener.start()
+    try:
+        head = b"POST /telegram HTTP/1.1\r\nContent-Length: %s\r\n\r\n"
+        return [
+            await raw_status(listener.port, head % b"-5"),
+            await raw_status(listener.port, head % b"abc"),
+            await raw_status(listener.port, b"POST /telegram HTTP/1.1\r\n"),  # client goes idle
+        ]
+    finally:
+        await listener.stop()
+
+
+def test_webhook_roundtrip():
+    """Valid update is accepted and delivered; bad secret and bad JSON are rejected."""
+    statuses, received = asyncio.run(run_checks())
+
+    print(f"Valid update → HTTP {statuses[0]}")
+    print(f"Wrong secret → HTTP {statuses[1]}")
+    print(f"Invalid JSON → HTTP {statuses[2]}")
+
+    assert statuses == [200, 401, 400], statuses
+    assert received == [RECORDED_UPDATE], received
+
+
+def test_malformed_requests():
+    """Bad Content-Length is a 400 (not a 500); an idle client is cut off with 408."""
+    statuses = asyncio.run(run_malformed_checks())
+
+    print(f"Negative Content-Length → HTTP {statuses[0]}")
+    print(f"Non-numeric Content-Length → HTTP {statuses[1]}")
+    print(f"Idle connection → HTTP {statuses[2]}")
+
+    assert statuses == [400, 400, 408], statuses
+
+
+def test_secret_required():
+    async def sink(data: dict) -> None:
+        pass
+
+    for secret in (None, ""):
+        try:
+            telegram_webhook_handler(secret, sink)
+        except ValueError:
+            continue
+        raise AssertionError("webhook handler accepted an empty secret")
+
+
+if __name__ == "__main__":
+    print("=" * 60)
+    print("Testing Webhook Ingestion (offline)")
+    print("=" * 60)
+    print()
+    test_webhook_roundtrip()
+    test_malformed_requests()
+    test_secret_required()
+    print()
+    print("✅ Webhook listener works!")